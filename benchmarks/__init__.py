@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the DPR pipeline.
+
+Everything in here runs without a Groq key or the real DPR.xlsx: workbooks
+are generated on the fly and the LLM is replaced by a deterministic stub.
+"""
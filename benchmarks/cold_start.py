@@ -0,0 +1,78 @@
+"""
+Cold-start import budget for each entry point.
+
+Every entry point is started in a fresh interpreter several times and the
+median wall time is compared against its budget. The exit code is non-zero
+when any entry point goes over budget, so this can run as a check in CI.
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 7 --budget server=1.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# entry point -> (startup code, budget in seconds of median wall time,
+#                 modules that must not be imported as a side effect)
+ENTRY_POINTS = {
+    "server": ("import server", 1.5, ["streamlit", "pydantic_ai"]),
+    "src.main": ("import src.main", 0.8, ["pydantic_ai"]),
+    "desktop_app.launch": ("import desktop_app.launch as launch; launch.check_dependencies()",
+                           0.2, ["whisper", "torch", "PyQt5"]),
+}
+
+
+def _run(code: str) -> str:
+    env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "offline-benchmark"))
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def time_startup(code: str) -> float:
+    start = time.perf_counter()
+    _run(code)
+    return time.perf_counter() - start
+
+
+def leaked_modules(code: str, forbidden: list) -> list:
+    output = _run(f"{code}\nimport sys\nprint('|' + ','.join(m for m in {forbidden!r} if m in sys.modules))")
+    return [m for m in output.rsplit("|", 1)[-1].strip().split(",") if m]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time per entry point")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[],
+                        help="override a budget, e.g. server=1.5")
+    args = parser.parse_args(argv)
+
+    budgets = {name: budget for name, (_, budget, _) in ENTRY_POINTS.items()}
+    for item in args.budget:
+        name, _, seconds = item.partition("=")
+        budgets[name] = float(seconds)
+
+    failed = False
+    print(f"{'entry point':<22}{'median_s':>10}{'budget_s':>10}  status")
+    for name, (code, _, forbidden) in ENTRY_POINTS.items():
+        budget = budgets[name]
+        median = statistics.median(time_startup(code) for _ in range(args.runs))
+        leaked = leaked_modules(code, forbidden)
+        status = "ok"
+        if median > budget:
+            status = "over budget"
+        if leaked:
+            status = f"imports {', '.join(leaked)}"
+        failed = failed or status != "ok"
+        print(f"{name:<22}{median:>10.3f}{budget:>10.2f}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+HTTP load test for server.py.
+
+Starts the FastAPI app on a local port with the LLM stubbed, replays
+`/process` payloads at a configurable concurrency and arrival rate, and then
+checks that every targeted cell grew by exactly the sum of the quantities
+that were submitted for it, so lost updates under concurrency show up as
+mismatches.
+
+The corpus is a JSONL file with one `/process` payload per line
+(`transcription_list`, `sheet_name`, `name`, `location`); lines without a
+`transcription_list` are skipped. Without a corpus, synthetic payloads are
+generated against a synthetic workbook.
+
+Usage:
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --rate 50
+    python -m benchmarks.load_test --corpus payloads.jsonl --workbook excel_files/DPR.xlsx
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+# The stub has no rate limits; keep the scheduler from throttling the benchmark.
+os.environ.setdefault("LLM_RPM", "1000000")
+os.environ.setdefault("LLM_TPM", "1000000000")
+
+import httpx
+import openpyxl
+
+from benchmarks.run import percentile, use_workbook
+from benchmarks.stub_model import best_row, quantity_in, stub_llm
+from benchmarks.workbook import build_workbook, description_for, FIRST_DESCRIPTION_ROW
+
+
+def load_corpus(path: str) -> List[dict]:
+    payloads = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if isinstance(data, dict) and data.get("transcription_list"):
+                payloads.append(data)
+    return payloads
+
+
+def synthetic_corpus(sheet_name: str, rows: int, count: int, per_request: int, seed: int = 0) -> List[dict]:
+    """Payloads that deliberately hit a few rows many times to surface lost updates."""
+    rng = random.Random(seed)
+    hot_rows = [FIRST_DESCRIPTION_ROW + i for i in range(min(rows, 5))]
+    payloads = []
+    for i in range(count):
+        transcriptions = []
+        for _ in range(per_request):
+            row = rng.choice(hot_rows)
+            transcriptions.append(f"{rng.randint(1, 9)} units of {description_for(row)} is done")
+        payloads.append({"transcription_list": transcriptions, "sheet_name": sheet_name,
+                         "name": "loadtest", "location": f"site-{i % 4}", "idempotency_key": f"load-{seed}-{i}"})
+    return payloads
+
+
+def read_descriptions(file_path: str, sheet_name: str) -> List[Tuple[int, str]]:
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    ws = wb[sheet_name]
+    rows = [(row_num, str(value)) for row_num, (value,) in
+            enumerate(ws.iter_rows(min_row=FIRST_DESCRIPTION_ROW, min_col=3, max_col=3, values_only=True),
+                      start=FIRST_DESCRIPTION_ROW)
+            if value is not None and str(value).strip() != ""]
+    wb.close()
+    return rows
+
+
+def expected_increments(file_path: str, payloads: List[dict]) -> Dict[Tuple[str, int], float]:
+    """What the stub will answer for every submitted transcription, summed per (sheet, row)."""
+    descriptions = {}
+    expected = defaultdict(float)
+    for payload in payloads:
+        sheet = payload.get("sheet_name", "")
+        if sheet not in descriptions:
+            descriptions[sheet] = read_descriptions(file_path, sheet)
+        for text in payload["transcription_list"]:
+            row = best_row(descriptions[sheet], text)
+            if row is not None:
+                expected[(sheet, row)] += quantity_in(text)
+    return expected
+
+
+def read_cells(file_path: str, keys, date: datetime.date) -> Dict[Tuple[str, int], float]:
+    from src.sheet_data_fetch import get_date_column
+
+    values = {}
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    columns = {}
+    for sheet, row in keys:
+        if sheet not in columns:
+            columns[sheet] = get_date_column(file_path, sheet, date)
+        column = columns[sheet]
+        cell = wb[sheet].cell(row=row, column=column).value if column else None
+        try:
+            values[(sheet, row)] = float(cell) if cell is not None else 0.0
+        except (TypeError, ValueError):
+            values[(sheet, row)] = 0.0
+    wb.close()
+    return values
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Run server.app under uvicorn in a background thread with the LLM stubbed."""
+
+    def __init__(self, file_path: str, latency: float, port: Optional[int] = None):
+        import uvicorn
+        import server
+
+        use_workbook(file_path)
+        self.port = port or free_port()
+        self.latency = latency
+        self._server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=self.port,
+                                                     log_level="warning"))
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _serve(self):
+        # The model override lives in a context variable, so it has to be set in this thread.
+        with stub_llm(self.latency):
+            self._server.run()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+async def replay(url: str, payloads: List[dict], concurrency: int, rate: float, seed: int = 0) -> dict:
+    """
+    Send every payload once. Arrivals follow a Poisson process at `rate`
+    requests/sec (0 sends as fast as the concurrency limit allows).
+    """
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = defaultdict(int)
+
+    async def send(client: httpx.AsyncClient, payload: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/process", content=json.dumps(payload))
+                if response.status_code >= 400:
+                    errors[f"http_{response.status_code}"] += 1
+                    return
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for payload in payloads:
+            tasks.append(asyncio.create_task(send(client, payload)))
+            if rate > 0:
+                await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(payloads),
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+
+def run(payloads: List[dict], file_path: str, concurrency: int, rate: float, latency: float) -> dict:
+    expected = expected_increments(file_path, payloads)
+    today = datetime.date.today()
+    before = read_cells(file_path, expected.keys(), today)
+
+    with LocalServer(file_path, latency) as local:
+        report = asyncio.run(replay(local.url, payloads, concurrency, rate))
+
+    after = read_cells(file_path, expected.keys(), today)
+    mismatches = []
+    for key, increment in sorted(expected.items()):
+        actual = after[key] - before[key]
+        if abs(actual - increment) > 1e-6:
+            mismatches.append({"sheet": key[0], "row": key[1], "expected": increment, "actual": actual})
+
+    report.update({
+        "concurrency": concurrency,
+        "arrival_rate": rate,
+        "llm_latency_s": latency,
+        "cells_checked": len(expected),
+        "lost_updates": mismatches,
+        "consistent": not mismatches and not report["errors"],
+    })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay /process payloads against a local server.py")
+    parser.add_argument("--corpus", help="JSONL file of recorded /process payloads")
+    parser.add_argument("--workbook", help="workbook to copy and run against (required with --corpus)")
+    parser.add_argument("--requests", type=int, default=100, help="synthetic payloads to send")
+    parser.add_argument("--per-request", type=int, default=1, help="transcriptions per synthetic payload")
+    parser.add_argument("--rows", type=int, default=50, help="rows in the synthetic workbook")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="arrivals per second, 0 for closed loop")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="dpr-load-") as workdir:
+        file_path = os.path.join(workdir, "load.xlsx")
+        os.environ.setdefault("DPR_DEDUPE_DB", os.path.join(workdir, "dedupe.sqlite3"))
+        if args.corpus:
+            if not args.workbook:
+                parser.error("--workbook is required with --corpus")
+            # Never mutate the real workbook.
+            shutil.copyfile(args.workbook, file_path)
+            payloads = load_corpus(args.corpus)
+            # Replayed payloads are all meant to count; only keys recorded in the corpus dedupe.
+            for i, payload in enumerate(payloads):
+                payload.setdefault("idempotency_key", f"corpus-{i}")
+        else:
+            sheet_name = build_workbook(file_path, rows=args.rows)[0]
+            payloads = synthetic_corpus(sheet_name, args.rows, args.requests, args.per_request)
+
+        report = run(payloads, file_path, args.concurrency, args.rate, args.latency)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    return 0 if report["consistent"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
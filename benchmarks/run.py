@@ -0,0 +1,184 @@
+"""
+Throughput benchmark for the DPR pipeline.
+
+Runs `updated_quantity_in_sheet` directly and `/process` through the ASGI app
+against synthetic workbooks of several sizes, with the LLM replaced by the
+deterministic stub. Reports ops/sec, p50/p95 latency and peak RSS.
+
+Usage:
+    python -m benchmarks.run --rows 50 500 2000 --reports 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).parent.parent))
+# The real key is never used; the agent only needs one to be constructed.
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+# The stub has no rate limits; keep the scheduler from throttling the benchmark.
+os.environ.setdefault("LLM_RPM", "1000000")
+os.environ.setdefault("LLM_TPM", "1000000000")
+
+import psutil
+
+from benchmarks.stub_model import stub_llm
+from benchmarks.workbook import build_workbook, description_for, FIRST_DESCRIPTION_ROW
+
+
+class PeakRSS:
+    """Sample the resident set size in a background thread and keep the peak."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(scenario: str, rows: int, latencies: List[float], elapsed: float, peak_rss: int) -> dict:
+    return {
+        "scenario": scenario,
+        "rows": rows,
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+    }
+
+
+def synthetic_reports(rows: int, count: int) -> List[str]:
+    """Search descriptions that each target one known row of the synthetic sheet."""
+    reports = []
+    for i in range(count):
+        row = FIRST_DESCRIPTION_ROW + (i * 7) % rows
+        reports.append(f"{(i % 9) + 1} units of {description_for(row)} is done")
+    return reports
+
+
+async def bench_pipeline(file_path: str, sheet_name: str, reports: List[str]) -> List[float]:
+    from src.main import updated_quantity_in_sheet
+
+    latencies = []
+    for report in reports:
+        start = time.perf_counter()
+        await updated_quantity_in_sheet(report, sheet_name, "bench", "bench", file_path=file_path)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def bench_process(sheet_name: str, reports: List[str]) -> List[float]:
+    import httpx
+    import server
+
+    transport = httpx.ASGITransport(app=server.app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for report in reports:
+            # Every report is a separate submission, even when the synthetic text repeats.
+            payload = {"transcription_list": [report], "sheet_name": sheet_name,
+                       "name": "bench", "location": "bench", "idempotency_key": uuid.uuid4().hex}
+            start = time.perf_counter()
+            response = await client.post("/process", content=json.dumps(payload))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def use_workbook(file_path: str):
+    """Make `file_path` the default project, which /process writes to."""
+    from src.projects import Project, ProjectRegistry, set_registry, DEFAULT_PROJECT_ID
+
+    set_registry(ProjectRegistry([Project(project_id=DEFAULT_PROJECT_ID, file_path=file_path)]))
+
+
+def run(rows_list: List[int], sheets: int, reports: int, latency: float, workdir: str) -> List[dict]:
+    results = []
+    for rows in rows_list:
+        file_path = os.path.join(workdir, f"bench_{rows}.xlsx")
+        sheet_names = build_workbook(file_path, rows=rows, sheets=sheets)
+        sheet_name = sheet_names[0]
+        texts = synthetic_reports(rows, reports)
+
+        use_workbook(file_path)
+        with stub_llm(latency):
+            start = time.perf_counter()
+            with PeakRSS() as rss:
+                latencies = asyncio.run(bench_pipeline(file_path, sheet_name, texts))
+            results.append(summarize("updated_quantity_in_sheet", rows, latencies,
+                                     time.perf_counter() - start, rss.peak))
+
+            start = time.perf_counter()
+            with PeakRSS() as rss:
+                latencies = asyncio.run(bench_process(sheet_name, texts))
+            results.append(summarize("/process", rows, latencies,
+                                     time.perf_counter() - start, rss.peak))
+    return results
+
+
+def print_table(results: List[dict]):
+    columns = ["scenario", "rows", "ops", "ops_per_sec", "p50_ms", "p95_ms", "mean_ms", "peak_rss_mb"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(widths[c]) for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline DPR pipeline benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500, 2000],
+                        help="description rows per sheet, one run per value")
+    parser.add_argument("--sheets", type=int, default=3, help="monthly sheets per workbook")
+    parser.add_argument("--reports", type=int, default=20, help="reports per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub LLM latency in seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="dpr-bench-") as workdir:
+        os.environ.setdefault("DPR_DEDUPE_DB", os.path.join(workdir, "dedupe.sqlite3"))
+        results = run(args.rows, args.sheets, args.reports, args.latency, workdir)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print_table(results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
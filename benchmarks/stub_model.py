@@ -0,0 +1,102 @@
+"""
+Deterministic stand-in for the Groq model.
+
+The stub reads the description list and the search description out of the
+prompt built by `prompt_builder`, picks the item whose description shares the
+most words with the search text, and takes the first number in the search
+text as the quantity. For the fast tier of the cascade it reports a high
+confidence when the best item wins outright and a low one on a tie. It can
+sleep for a configurable latency to model the network round trip.
+"""
+import asyncio
+import re
+from contextlib import ExitStack, contextmanager
+from typing import List, Optional, Tuple
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+_ITEM_PATTERN = re.compile(r"\((['\"])([\w-]+)\1, (['\"])(.*?)\3\)")
+_SEARCH_PATTERN = re.compile(r"search description : (.*)")
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _last_user_prompt(messages: List[ModelMessage]) -> str:
+    for message in reversed(messages):
+        for part in getattr(message, "parts", []):
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                return part.content
+    return ""
+
+
+def _words(text: str) -> set:
+    return set(_WORD_PATTERN.findall(text.lower()))
+
+
+def parse_prompt(prompt: str) -> Tuple[List[Tuple[str, str]], str]:
+    """Return the (item ID, description) pairs and the search text found in a prompt."""
+    items = [(match.group(2), match.group(4)) for match in _ITEM_PATTERN.finditer(prompt)]
+    search = _SEARCH_PATTERN.search(prompt)
+    return items, search.group(1).strip() if search else ""
+
+
+def best_match(rows: List[Tuple[object, str]], search: str) -> Tuple[Optional[object], float]:
+    """
+    Key (row or item ID) of the description with the largest word overlap,
+    and a confidence: 0.9 when it beats every other description, 0.4 on a tie.
+    Ties go to the first one listed.
+    """
+    search_words = _words(search)
+    best, best_score, runner_up = None, -1, -1
+    for row, description in rows:
+        score = len(search_words & _words(description))
+        if score > best_score:
+            best, best_score, runner_up = row, score, best_score
+        elif score > runner_up:
+            runner_up = score
+    return best, 0.9 if best_score > runner_up else 0.4
+
+
+def best_row(rows: List[Tuple[object, str]], search: str) -> Optional[object]:
+    return best_match(rows, search)[0]
+
+
+def quantity_in(search: str) -> float:
+    match = _NUMBER_PATTERN.search(search)
+    return float(match.group()) if match else 0.0
+
+
+def make_stub_model(latency: float = 0.0) -> FunctionModel:
+    """
+    Build a FunctionModel that answers like `support_agent` would.
+
+    Args:
+        latency: Seconds to sleep before answering
+    """
+    async def respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if latency:
+            await asyncio.sleep(latency)
+        items, search = parse_prompt(_last_user_prompt(messages))
+        item_id, confidence = best_match(items, search)
+        args = {
+            "item_id": item_id or "",
+            "updated_quantity": quantity_in(search),
+        }
+        output_tool = info.output_tools[0]
+        if "confidence" in output_tool.parameters_json_schema.get("properties", {}):
+            args["confidence"] = confidence
+        return ModelResponse(parts=[ToolCallPart(output_tool.name, args)])
+
+    return FunctionModel(respond, model_name="stub")
+
+
+@contextmanager
+def stub_llm(latency: float = 0.0):
+    """Swap the model behind every agent of both cascade tiers for the stub while the block runs."""
+    from src.llm_result import get_fast_chain, get_provider_chain
+
+    with ExitStack() as stack:
+        for provider in [*get_fast_chain(), *get_provider_chain()]:
+            stack.enter_context(provider.agent.override(model=make_stub_model(latency)))
+        yield
@@ -0,0 +1,112 @@
+"""
+Synthetic DPR-shaped workbooks.
+
+The layout mirrors excel_files/DPR.xlsx:
+    - row 1: "Progress Status" in A1, then one date header per day; the
+      achieved quantity for that day lives in the column right after it
+    - row 2: column headers
+    - column C from row 5: BOQ descriptions
+    - a LOGS sheet with the log headers written by put_logs_in_file
+"""
+import calendar
+import datetime
+import random
+from typing import List, Optional, Tuple
+
+import openpyxl
+
+FIRST_DATE_COLUMN = 20
+FIRST_DESCRIPTION_ROW = 5
+
+ACTIVITIES = [
+    "Excavation for foundation of all type of soil",
+    "Plain cement concrete M15 in levelling course",
+    "Reinforced cement concrete M25 in footings",
+    "Supply and fixing of structural steel",
+    "Hot dip galvanization of steel members",
+    "Brick masonry in cement mortar 1:6",
+    "Internal plaster 12 mm thick",
+    "Backfilling with approved excavated earth",
+    "Anti termite treatment of foundations",
+    "Laying of HDPE pipe 110 mm dia",
+]
+UNITS = ["Cum.", "Sqm.", "MT", "Kg", "Rmt."]
+LOG_HEADERS = ['Logged_At', 'Updated_Sheet', 'Name', 'Location',
+               'Description', 'Row', 'Column', 'Value']
+
+
+def month_sheet_name(year: int, month: int) -> str:
+    """Sheet names follow the `July.25` convention used in DPR.xlsx."""
+    return f"{calendar.month_name[month]}.{year % 100:02d}"
+
+
+def previous_months(count: int, start: Optional[datetime.date] = None) -> List[Tuple[int, int]]:
+    """Return (year, month) pairs, newest first, starting at `start`'s month."""
+    start = start or datetime.date.today()
+    year, month = start.year, start.month
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return months
+
+
+def description_for(row_number: int) -> str:
+    """Deterministic, unique description for a synthetic BOQ row."""
+    activity = ACTIVITIES[row_number % len(ACTIVITIES)]
+    return f"{activity} (BOQ {row_number:04d})"
+
+
+def build_workbook(file_path: str, rows: int = 50, sheets: int = 1,
+                   start: Optional[datetime.date] = None, seed: int = 0) -> List[str]:
+    """
+    Write a DPR-shaped workbook to `file_path`.
+
+    Args:
+        file_path: Where to save the .xlsx
+        rows: Number of BOQ description rows per sheet
+        sheets: Number of monthly sheets; the first one covers `start`'s month
+        start: Date whose month the first sheet covers, defaults to today
+        seed: Seed for the filler values in the planned-quantity columns
+
+    Returns:
+        List[str]: The names of the monthly sheets, newest first
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    sheet_names = []
+    for year, month in previous_months(sheets, start):
+        name = month_sheet_name(year, month)
+        sheet_names.append(name)
+        ws = wb.create_sheet(name)
+
+        ws.cell(row=1, column=1, value="Progress Status")
+        for col, header in enumerate(["Sr. No.", "BOQ\nNo.", "Description", "Location", "Unit",
+                                      "BOQ/GFC\n Quantity"], start=1):
+            ws.cell(row=2, column=col, value=header)
+
+        days = calendar.monthrange(year, month)[1]
+        for day in range(1, days + 1):
+            col = FIRST_DATE_COLUMN + (day - 1) * 2
+            ws.cell(row=1, column=col, value=datetime.datetime(year, month, day))
+            ws.cell(row=2, column=col, value="Planned Qty.")
+            ws.cell(row=2, column=col + 1, value="Achieved Qty.")
+
+        for i in range(rows):
+            row = FIRST_DESCRIPTION_ROW + i
+            ws.cell(row=row, column=1, value=i + 1)
+            ws.cell(row=row, column=2, value=i + 1)
+            ws.cell(row=row, column=3, value=description_for(row))
+            ws.cell(row=row, column=5, value=rng.choice(UNITS))
+            ws.cell(row=row, column=6, value=rng.randint(100, 50000))
+
+    logs = wb.create_sheet("LOGS")
+    logs.append(LOG_HEADERS)
+
+    wb.save(file_path)
+    wb.close()
+    return sheet_names
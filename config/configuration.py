@@ -28,6 +28,39 @@ else:  # Unix/Linux/macOS
 # Ensure config directory exists
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
+# Multi-project setup: JSON file mapping project IDs to workbooks (see src/projects.py),
+# can be overridden with the DPR_PROJECTS_FILE environment variable
+PROJECTS_FILE = os.path.join(CONFIG_DIR, "projects.json")
+# Concurrent reports processed per project unless the project sets max_concurrency
+DEFAULT_PROJECT_CONCURRENCY = 4
+
+# Idempotent /process submissions (see src/idempotency.py): the dedupe store,
+# how long a result is remembered, and the time bucket used for reports that
+# arrive without an idempotency key
+DEDUPE_DB = os.path.join(CONFIG_DIR, "dedupe.sqlite3")
+DEDUPE_TTL_SECONDS = 24 * 60 * 60
+DEDUPE_BUCKET_SECONDS = 5 * 60
+# A claim still pending after this long is treated as abandoned (its process died)
+DEDUPE_LEASE_SECONDS = 120
+
+# Batch ingestion (/process_batch) limits, and the desktop app's offline outbox
+MAX_BATCH_ITEMS = 200
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+OUTBOX_DB = os.path.join(CONFIG_DIR, "outbox.sqlite3")
+
+# Bulk CSV/JSONL imports (/import): largest accepted upload and records processed at once
+MAX_IMPORT_BYTES = 100 * 1024 * 1024
+BULK_IMPORT_CONCURRENCY = 8
+
+# Model cascade (see src/llm_cascade.py): fast-tier answers below this confidence,
+# or slower than this many seconds, are escalated to the large models
+CASCADE_MIN_CONFIDENCE = 0.8
+CASCADE_FAST_TIMEOUT = 3.0
+
+# Idle LLM connections stay in the pool this long, so a connection opened by
+# a warm-up (see src/warmup.py) is still there when the report arrives
+LLM_KEEPALIVE_SECONDS = 120
+
 # Example of how to use these paths:
 # - To get the path to the Excel file: FILE_PATH
 # - To create a new file in the config directory: os.path.join(CONFIG_DIR, 'config.json')
@@ -7,23 +7,20 @@ This script launches the DPR Voice Assistant desktop application.
 import sys
 import os
 import subprocess
+from importlib.util import find_spec
 from pathlib import Path
 
+REQUIRED_MODULES = [
+    "PyQt5", "sounddevice", "soundfile", "numpy", "whisper", "openpyxl", "pydantic", "groq",
+]
+
 def check_dependencies():
-    """Check if all required dependencies are installed"""
-    try:
-        import PyQt5
-        import sounddevice
-        import soundfile
-        import numpy
-        import whisper
-        import openpyxl
-        import pydantic
-        import groq
-        return True
-    except ImportError as e:
-        print(f"Missing dependency: {e}")
+    """Check if all required dependencies are installed without importing them"""
+    missing = [name for name in REQUIRED_MODULES if find_spec(name) is None]
+    if missing:
+        print(f"Missing dependency: {', '.join(missing)}")
         return False
+    return True
 
 def install_dependencies():
     """Install required Python packages"""
@@ -14,14 +14,16 @@ from PyQt5.QtGui import QDesktopServices
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
-import whisper
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 # Import DPR functionality
 sys.path.append(str(Path(__file__).parent.parent))
-from src.main import updated_quantity_in_sheet
-from src.sheet_data_fetch import get_available_sheets
+from src.sheet_catalog import get_sheet_catalog
+from desktop_app.outbox import Outbox, HttpSender, LocalSender
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class AudioRecorder(QThread):
     """Thread for handling audio recording"""
@@ -35,7 +37,15 @@ class AudioRecorder(QThread):
         self.frames = []
         self.stream = None
         self.recording = []
-        self.model = whisper.load_model("base")
+        self._model = None
+    
+    @property
+    def model(self):
+        """Whisper (and torch) is only imported and loaded on the first transcription"""
+        if self._model is None:
+            import whisper
+            self._model = whisper.load_model("base")
+        return self._model
     
     def run(self):
         self.is_recording = True
@@ -74,6 +84,59 @@ class AudioRecorder(QThread):
         except Exception as e:
             self.update_signal.emit(f"Error in transcription: {str(e)}")
 
+class OutboxSyncWorker(QThread):
+    """Thread that delivers queued reports whenever one is added, and periodically"""
+    synced = pyqtSignal(dict)
+    
+    def __init__(self, outbox, interval=30):
+        super().__init__()
+        self.outbox = outbox
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = False
+        self._local_sender = None
+        self._prefetch_sheet = None
+    
+    def make_sender(self):
+        # DPR_SERVER_URL sends reports to a DPR server; without it they update the local workbook
+        server_url = os.getenv("DPR_SERVER_URL", "").strip()
+        project = os.getenv("DPR_PROJECT") or None
+        if server_url:
+            return HttpSender(server_url, project)
+        if self._local_sender is None or self._local_sender.project != project:
+            self._local_sender = LocalSender(project)
+        return self._local_sender
+    
+    def run(self):
+        while not self._stopping:
+            self._wake.clear()
+            if self.outbox.counts()["pending"]:
+                try:
+                    self.synced.emit(self.outbox.sync(self.make_sender()))
+                except Exception as e:
+                    self.synced.emit({"delivered": 0, "failed": 0, "error": str(e),
+                                      "pending": self.outbox.counts()["pending"]})
+            sheet_name, self._prefetch_sheet = self._prefetch_sheet, None
+            if sheet_name:
+                try:
+                    self.make_sender().warm(sheet_name)
+                except Exception as e:
+                    logger.warning(f"warm-up of {sheet_name} failed: {str(e)}")
+            self._wake.wait(self.interval)
+    
+    def wake(self):
+        self._wake.set()
+    
+    def prefetch(self, sheet_name):
+        # Runs on this thread (after any queued reports), on the same loop the reports use
+        self._prefetch_sheet = sheet_name
+        self._wake.set()
+    
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        self.wait()
+
 class ApiKeyTab(QWidget):
     """Tab for managing API keys and user information"""
     def __init__(self, parent=None):
@@ -250,9 +313,14 @@ class MainTab(QWidget):
         self.recorder = AudioRecorder()
         self.recorder.update_signal.connect(self.update_transcription)
         self.sheets = []
+        # Reports are stored locally first, so they survive a lost connection or a restart
+        self.outbox = Outbox()
+        self.sync_worker = OutboxSyncWorker(self.outbox)
+        self.sync_worker.synced.connect(self.show_sync_result)
         self.init_ui()
         self.update_ui_state()
         self.load_sheets()
+        self.sync_worker.start()
     
     def init_ui(self):
         layout = QVBoxLayout()
@@ -261,6 +329,7 @@ class MainTab(QWidget):
         sheet_layout = QHBoxLayout()
         sheet_layout.addWidget(QLabel("Select Sheet:"))
         self.sheet_combo = QComboBox()
+        self.sheet_combo.currentTextChanged.connect(self.prefetch_sheet)
         sheet_layout.addWidget(self.sheet_combo)
         self.refresh_btn = QPushButton("🔄")
         self.refresh_btn.setToolTip("Refresh sheets")
@@ -308,10 +377,11 @@ class MainTab(QWidget):
     def load_sheets(self):
         """Load available sheets from Excel file"""
         try:
-            from src.sheet_data_fetch import get_available_sheets
             excel_path = os.path.join(os.path.dirname(__file__), "..", "excel_files", "DPR.xlsx")
             if os.path.exists(excel_path):
-                self.sheets = [s for s in get_available_sheets(excel_path) if "log" not in s.lower()]
+                # Cached per workbook version, so refreshing an unchanged file is free
+                catalog = get_sheet_catalog(excel_path)
+                self.sheets = [s for s in catalog.sheet_names if "log" not in s.lower()]
                 self.sheet_combo.clear()
                 self.sheet_combo.addItems(self.sheets)
                 if self.sheets:
@@ -323,6 +393,11 @@ class MainTab(QWidget):
         except Exception as e:
             self.parent.statusBar().showMessage(f"Error loading sheets: {str(e)}")
     
+    def prefetch_sheet(self, sheet_name):
+        """Warm up the selected sheet in the background so the first report is fast"""
+        if sheet_name and bool(os.getenv("GROQ_API_KEY")):
+            self.sync_worker.prefetch(sheet_name)
+    
     def toggle_recording(self):
         if self.record_btn.isChecked():
             self.record_btn.setText("⏹️ Stop Recording")
@@ -358,20 +433,27 @@ class MainTab(QWidget):
         user_location = os.getenv("USER_LOCATION", "Desktop App")
         
         try:
-            # Use the existing DPR functionality to update the sheet
-            updated_quantity_in_sheet(
-                description=text,
-                sheet_name=sheet_name,
-                name=user_name,
-                location=user_location
-            )
-            
-            QMessageBox.information(self, "Success", "Successfully updated the sheet!")
-            self.clear_transcription()
-            
+            self.outbox.add(text, sheet_name, user_name, user_location)
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to update sheet: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to save report: {str(e)}")
             self.parent.statusBar().showMessage(f"Error: {str(e)}")
+            return
+        
+        self.clear_transcription()
+        self.parent.statusBar().showMessage("Report queued, updating the sheet...")
+        self.sync_worker.wake()
+    
+    def show_sync_result(self, result):
+        """Report the outcome of an outbox sync in the status bar"""
+        pending = result.get("pending", 0)
+        if result.get("error"):
+            self.parent.statusBar().showMessage(
+                f"Offline, {pending} report(s) waiting to sync: {result['error']}")
+        elif result.get("failed"):
+            self.parent.statusBar().showMessage(
+                f"Updated {result['delivered']} report(s), {result['failed']} failed")
+        else:
+            self.parent.statusBar().showMessage(f"Successfully updated the sheet ({result['delivered']} report(s))")
 
 class ServerTab(QWidget):
     """Tab for managing server connection and device sharing"""
@@ -529,6 +611,10 @@ class DPRWindow(QMainWindow):
         if not os.getenv("GROQ_API_KEY"):
             self.tabs.setCurrentWidget(self.api_key_tab)
             self.statusBar().showMessage("Please set your Groq API key to continue")
+    
+    def closeEvent(self, event):
+        self.main_tab.sync_worker.stop()
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,237 @@
+"""
+Durable outbox for reports made on a field device.
+
+A report is written to a local SQLite database before anything is sent, so
+nothing is lost when the site has no connectivity or the app is closed.
+`Outbox.sync` delivers due reports in batches and removes every report the
+receiver acknowledged; failed reports are retried with exponential backoff.
+
+Two senders are available:
+- `HttpSender` posts gzip-compressed batches to a DPR server's `/process_batch`
+- `LocalSender` runs the same batch processing in this process, for a
+  desktop app that updates its own workbook directly
+
+A batch the server answers with a client error (unknown project, bad or
+oversized batch) is kept as failed instead of being retried; server errors
+are retried with backoff. Neither counts as being offline.
+
+Each report's id is its idempotency key, so a batch that was processed but
+whose response was lost is acknowledged as duplicates on the next attempt.
+"""
+import json
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Callable, List, Optional
+
+from config.configuration import OUTBOX_DB
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+FAILED = "failed"
+
+# Client errors that are worth another attempt later
+RETRYABLE_STATUS = (408, 425, 429)
+
+# Receives a list of report dicts and returns one acknowledgement per report
+Sender = Callable[[List[dict]], List[dict]]
+
+
+def http_error_detail(error: urllib.error.HTTPError) -> str:
+    """The `detail` of a FastAPI error response, or the HTTP reason."""
+    try:
+        return str(json.loads(error.read())["detail"])
+    except Exception:
+        return str(error.reason)
+
+
+class Outbox:
+    """SQLite-backed queue of reports that still have to be delivered."""
+
+    def __init__(self, path: str = OUTBOX_DB, max_attempts: int = 10,
+                 base_backoff: float = 5.0, max_backoff: float = 600.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id TEXT PRIMARY KEY, payload TEXT NOT NULL, state TEXT NOT NULL,"
+            " created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL, last_error TEXT)")
+
+    def add(self, transcription: str, sheet_name: str, name: str = "", location: str = "") -> str:
+        """Store a report and return its id."""
+        now = time.time()
+        item_id = uuid.uuid4().hex
+        item = {"id": item_id, "transcription": transcription, "sheet_name": sheet_name,
+                "name": name, "location": location, "timestamp": now}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (id, payload, state, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (item_id, json.dumps(item), PENDING, now, now))
+        return item_id
+
+    def due(self, limit: int = 50) -> List[dict]:
+        """Oldest pending reports whose next attempt is due."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM outbox WHERE state = ? AND next_attempt_at <= ? ORDER BY created_at LIMIT ?",
+                (PENDING, time.time(), limit)).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def ack(self, item_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(item_id,) for item_id in item_ids])
+
+    def retry_later(self, item_id: str, error: str) -> None:
+        """Back off a report that failed; give up after max_attempts."""
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM outbox WHERE id = ?", (item_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row[0] + 1
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            self._conn.execute(
+                "UPDATE outbox SET attempts = ?, state = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, state, time.time() + delay, error, item_id))
+
+    def reject(self, item_id: str, error: str) -> None:
+        """Keep a report the receiver refused for inspection, without retrying it."""
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET state = ?, last_error = ? WHERE id = ?",
+                               (FAILED, error, item_id))
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall()
+        return {PENDING: 0, FAILED: 0, **dict(rows)}
+
+    def sync(self, send: Sender, batch_size: int = 50) -> dict:
+        """
+        Deliver due reports until none are left or the link fails.
+
+        Returns:
+            dict: Counts of delivered, failed and pending reports, and the
+                connection error if delivery stopped early
+        """
+        delivered = failed = 0
+        error = None
+        while True:
+            items = self.due(batch_size)
+            if not items:
+                break
+            try:
+                acks = send(items)
+            except urllib.error.HTTPError as e:
+                # The server answered, so the link is up; the batch itself failed.
+                reason = f"HTTP {e.code}: {http_error_detail(e)}"
+                retryable = e.code >= 500 or e.code in RETRYABLE_STATUS
+                logger.warning(f"outbox batch of {len(items)} failed: {reason}")
+                for item in items:
+                    if retryable:
+                        self.retry_later(item["id"], reason)
+                    else:
+                        # Unknown project, bad or oversized batch: sending it again cannot help.
+                        self.reject(item["id"], reason)
+                failed += len(items)
+                if retryable:
+                    break
+                continue
+            except (OSError, urllib.error.URLError, ValueError) as e:
+                # Link down or server unreachable: everything stays queued as it is.
+                error = str(e)
+                logger.warning(f"outbox sync stopped: {error}")
+                break
+            acked = {ack.get("id"): ack for ack in acks}
+            done = []
+            for item in items:
+                ack = acked.get(item["id"])
+                status = ack.get("status") if ack else None
+                if status in ("ok", "duplicate"):
+                    done.append(item["id"])
+                elif status == "rejected":
+                    self.reject(item["id"], ack.get("error", "rejected"))
+                    failed += 1
+                else:
+                    self.retry_later(item["id"], (ack or {}).get("error", "not acknowledged"))
+                    failed += 1
+            self.ack(done)
+            delivered += len(done)
+            if not done:
+                # Nothing went through; wait for the backoff instead of spinning.
+                break
+        return {"delivered": delivered, "failed": failed, "pending": self.counts()[PENDING], "error": error}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class HttpSender:
+    """Posts batches to `<server_url>/process_batch`, gzip-compressed."""
+
+    def __init__(self, server_url: str, project: Optional[str] = None, timeout: float = 120.0):
+        self.server_url = server_url.rstrip("/")
+        self.url = self.server_url + "/process_batch"
+        self.project = project
+        self.timeout = timeout
+
+    def __call__(self, items: List[dict]) -> List[dict]:
+        from src.batch import encode_batch
+        from src.llm_scheduler import INTERACTIVE
+
+        # The user is waiting on these reports, so they are not scheduled as bulk work.
+        request = urllib.request.Request(
+            self.url, data=encode_batch(items, self.project, INTERACTIVE), method="POST",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["acks"]
+
+    def warm(self, sheet_name: str) -> None:
+        """Have the server warm up `sheet_name` for the next report (through /get_credentials)."""
+        query = {"sheet_name": sheet_name, **({"project": self.project} if self.project else {})}
+        url = f"{self.server_url}/get_credentials?{urllib.parse.urlencode(query)}"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+
+
+class LocalSender:
+    """Processes batches in this process against the local workbook."""
+
+    def __init__(self, project: Optional[str] = None):
+        import asyncio
+
+        self.project = project
+        # One long-lived loop: the project's asyncio locks bind to the loop that first waits on them.
+        self._loop = asyncio.new_event_loop()
+
+    def __call__(self, items: List[dict]) -> List[dict]:
+        from src.batch import process_batch
+        from src.llm_scheduler import INTERACTIVE
+        from src.projects import get_registry
+
+        # The user is waiting on these reports, so they are not scheduled as bulk work.
+        return self._loop.run_until_complete(
+            process_batch(items, get_registry().get(self.project), INTERACTIVE))
+
+    def warm(self, sheet_name: str) -> None:
+        """Warm up `sheet_name` on the loop the reports run on, so its pooled connections are reused."""
+        from src.projects import get_registry
+        from src.warmup import prefetch
+
+        self._loop.run_until_complete(
+            prefetch(get_registry().get(self.project).file_path, sheet_name, trigger="desktop"))
+
+    def close(self) -> None:
+        self._loop.close()
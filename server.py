@@ -1,32 +1,194 @@
 import logging
 from fastapi import FastAPI, Request, HTTPException 
+from fastapi.responses import PlainTextResponse, JSONResponse, Response, StreamingResponse
 import subprocess
+import asyncio
 import threading
 import time
 import json
+import re
+import hashlib
+import email.utils
+import datetime
 from dotenv import load_dotenv
 import os
 from typing import Dict, Any
-from streamlit import rerun
 import uvicorn
 from utils.logger import get_logger
-from src.sheet_data_fetch import get_available_sheets
+from utils.metrics import REGISTRY, HTTP_REQUEST_SECONDS, span
+from utils.profiling import new_request_id, profile, wants_profile
+from src.sheet_catalog import get_sheet_catalog
+from src.workbook_watcher import WorkbookWatcher
 from src.main import updated_quantity_in_sheet
+from src.llm_result import warm_up
+from src.warmup import is_warm, schedule_prefetch
+from src.projects import Project, UnknownProjectError, get_registry
+from src.idempotency import SubmissionInProgress, get_dedupe_store, parse_timestamp, run_once, submission_keys
+from src.batch import BatchError, batch_priority, decode_batch, process_batch
+from src.bulk_import import detect_format, import_records, spool_upload
+from config.configuration import BULK_IMPORT_CONCURRENCY
+from src.progress import DEFAULT_WINDOW, daily_summary, item_summary
 from queue import Queue
 
 load_dotenv()
-PATH = os.getenv("EXCEL_FILE_PATH")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+WATCH_WORKBOOK = os.getenv("DPR_WATCH_WORKBOOK", "1") != "0"
 
 request_queue = Queue()
+workbook_watcher = WorkbookWatcher()
 app = FastAPI()
 logger = get_logger(__name__)
+
+@app.on_event("startup")
+async def warm_up_in_background():
+    # Not awaited: the socket starts listening while the agent is being built.
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+@app.on_event("startup")
+async def start_workbook_watcher():
+    if not WATCH_WORKBOOK:
+        return
+    try:
+        workbook_watcher.start()
+    except Exception as e:
+        logger.error(f"workbook watcher not started: {e}")
+        return
+    # Not awaited: the first indexes are built in worker threads while the server
+    # already accepts requests; later rebuilds happen in the watcher.
+    for project in get_registry().projects():
+        asyncio.get_running_loop().run_in_executor(None, watch_project, project)
+
+def watch_project(project: Project):
+    # One project with a missing or unreadable workbook must not stop the others
+    try:
+        workbook_watcher.watch(project.file_path)
+    except Exception as e:
+        logger.error(f"not watching workbook of project {project.project_id}: {e}")
+
+@app.on_event("shutdown")
+async def stop_workbook_watcher():
+    workbook_watcher.stop()
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                     method=request.method, endpoint=endpoint, status=status)
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Opt-in per-request profiling, see utils/profiling.py (DPR_PROFILE)"""
+    if not wants_profile(request.headers):
+        return await call_next(request)
+    request_id = request.headers.get("x-request-id", "")
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", request_id):
+        request_id = new_request_id()
+    # For streamed responses (/import) this covers the handler up to the first byte.
+    with profile(request_id, f"{request.method} {request.url.path}") as profile_id:
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def not_modified(request: Request, etag: str, modified_at: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since the way RFC 9110 orders them"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modified_at) <= since
+    return False
+
+def get_project(project_id: str = None) -> Project:
+    """Resolve the `project` parameter of a request; the default project when omitted"""
+    try:
+        return get_registry().get(project_id)
+    except UnknownProjectError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@app.get("/projects")
+async def list_projects():
+    return {"PROJECTS": [project.project_id for project in get_registry().projects()]}
+
 @app.get("/get_credentials")
-async def get_credentials():
-    return {"GROQ_API_KEY": GROQ_API_KEY, "AVAILABLE_SHEETS": get_available_sheets(PATH)}
+async def get_credentials(request: Request, project: str = None, sheet_name: str = None):
+    """Sheets and credentials for a client; also warms up `sheet_name` (or today's sheets) for its first report"""
+    project = get_project(project)
+    with span("get_sheet_catalog", project=project.project_id):
+        # A cache miss parses the whole workbook; keep that off the event loop
+        catalog = await asyncio.to_thread(get_sheet_catalog, project.file_path)
+    # Phones poll this endpoint: only warm up when the workbook changed or the sheet went cold.
+    if not is_warm(project.file_path, sheet_name, catalog.version):
+        schedule_prefetch(project.file_path, sheet_name, trigger="get_credentials")
+
+    # The key is part of the response, so a changed key must change the tag too.
+    digest = hashlib.sha1(f"{project.project_id}:{catalog.version_tag}:{GROQ_API_KEY}".encode()).hexdigest()[:16]
+    headers = {"ETag": f'"{digest}"', "Last-Modified": catalog.last_modified, "Cache-Control": "no-cache"}
+    if not_modified(request, headers["ETag"], catalog.modified_at):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse({
+        "GROQ_API_KEY": GROQ_API_KEY,
+        "AVAILABLE_SHEETS": catalog.sheet_names,
+        "SHEETS": [sheet.to_dict() for sheet in catalog.sheets],
+    }, headers=headers)
+
+def cached_json(request: Request, project: Project, build) -> Response:
+    """
+    JSON response for data derived from the workbook, tagged with its version
+    so polling clients get a 304 until the workbook changes.
+    """
+    catalog = get_sheet_catalog(project.file_path)
+    # Today matters too: "elapsed days" and default ranges move at midnight without a write.
+    raw = f"{project.project_id}:{catalog.version_tag}:{datetime.date.today()}:{request.url.path}?{request.url.query}"
+    headers = {"ETag": f'"{hashlib.sha1(raw.encode()).hexdigest()[:16]}"', "Cache-Control": "no-cache"}
+    if not_modified(request, headers["ETag"], catalog.modified_at):
+        return Response(status_code=304, headers=headers)
+    try:
+        body = build()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return JSONResponse(body, headers=headers)
+
+@app.get("/progress/{sheet_name}")
+async def progress_by_item(request: Request, sheet_name: str, project: str = None, start: datetime.date = None,
+                           end: datetime.date = None, window: int = DEFAULT_WINDOW):
+    """Per-BOQ-item totals, percentage complete and daily burn for a sheet (see src/progress.py)"""
+    target = get_project(project)
+    return await asyncio.to_thread(
+        cached_json, request, target,
+        lambda: item_summary(target.file_path, sheet_name, start, end, max(1, window)))
+
+@app.get("/progress/{sheet_name}/daily")
+async def progress_by_day(request: Request, sheet_name: str, project: str = None, start: datetime.date = None,
+                          end: datetime.date = None, window: int = DEFAULT_WINDOW, row: int = None):
+    """Per-day totals and rolling averages for a sheet, or for one item with `row`"""
+    target = get_project(project)
+    return await asyncio.to_thread(
+        cached_json, request, target,
+        lambda: daily_summary(target.file_path, sheet_name, start, end, max(1, window), row))
 
 @app.post("/process")
-async def process_data(request: Request):
+async def process_data(request: Request, project: str = None):
     try:
         # Get raw request body
         body = await request.body()
@@ -37,15 +199,74 @@ async def process_data(request: Request):
         sheet_name = data.get("sheet_name","")
         name = data.get("name","")
         location = data.get("location","")
+        target = get_project(data.get("project") or project)
+
+        # Phones retry when the tunnel times out; the same report must not be added twice.
+        keys = submission_keys(
+            transcription_list,
+            client_key=request.headers.get("idempotency-key") or data.get("idempotency_key"),
+            sheet_name=sheet_name, name=name, location=location, project=target.project_id,
+            timestamp=parse_timestamp(data.get("timestamp")))
+        store = get_dedupe_store()
+
+        results = []
+        for transcription, (key, alternate_keys) in zip(transcription_list, keys):
+            result, duplicate = await run_once(
+                store, key,
+                lambda transcription=transcription: updated_quantity_in_sheet(
+                    transcription, sheet_name, name, location, project=target),
+                alternate_keys=alternate_keys)
+            results.append({**result, "duplicate": duplicate})
+        return {"results": results}
 
-        for transcription in transcription_list:
-            await updated_quantity_in_sheet(transcription, sheet_name, name, location)
-        
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
+    except HTTPException:
+        raise
+    except SubmissionInProgress as e:
+        # A retry arrived while the original is still running; the client should retry later.
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/process_batch")
+async def process_data_batch(request: Request, project: str = None):
+    """
+    Queued reports from a device's outbox, optionally gzip-compressed
+    (`Content-Encoding: gzip`). Every item is acknowledged separately.
+    """
+    try:
+        data = decode_batch(await request.body(), request.headers.get("content-encoding"))
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    target = get_project(data.get("project") or project)
+    logger.info(f"batch of {len(data['items'])} items for project {target.project_id}")
+    return {"acks": await process_batch(data["items"], target, batch_priority(data))}
+
+@app.post("/import")
+async def import_reports(request: Request, project: str = None, sheet_name: str = "", name: str = "",
+                         location: str = "", format: str = None, concurrency: int = BULK_IMPORT_CONCURRENCY):
+    """
+    Bulk import a CSV or JSONL upload (see src/bulk_import.py). Per-record
+    results are streamed back as NDJSON while the import runs.
+    """
+    target = get_project(project)
+    try:
+        spool = await spool_upload(request.stream())
+    except BatchError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        fmt = detect_format(format, request.headers.get("content-type"), spool)
+    except BatchError as e:
+        spool.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    defaults = {"sheet_name": sheet_name, "name": name, "location": location}
+    records = import_records(spool, fmt, target, defaults, concurrency=max(1, min(concurrency, 32)))
+    logger.info(f"importing {fmt} upload into project {target.project_id}")
+    return StreamingResponse((json.dumps(result, default=str) + "\n" async for result in records),
+                             media_type="application/x-ndjson")
+
 
 def start_localtunnel():
     try:
@@ -0,0 +1,130 @@
+"""
+Batch ingestion of queued reports.
+
+Field devices keep reports in a local outbox while the link is down and send
+them later in one request (`POST /process_batch`, see desktop_app/outbox.py).
+Every item carries a client-generated `id` that is also its idempotency key,
+so a batch that is resent after a dropped connection only processes the items
+the server has not seen yet. Each item is acknowledged on its own:
+
+- ok: processed now
+- duplicate: processed by an earlier attempt, original result returned
+- rejected: the item itself is invalid, resending will not help
+- error: processing failed, the client should retry later
+
+A batch is scheduled as bulk work unless it sets `"priority": "interactive"`,
+which the desktop outbox does because a user is waiting on its reports.
+"""
+import asyncio
+import gzip
+import json
+import zlib
+from typing import List, Optional
+
+from config.configuration import MAX_BATCH_ITEMS, MAX_BATCH_BYTES
+from src.idempotency import get_dedupe_store, parse_timestamp, run_once, submission_keys
+from src.llm_scheduler import BULK, PRIORITY_NAMES
+from src.main import updated_quantity_in_sheet
+from src.projects import Project
+from utils.logger import get_logger
+from utils.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+BATCH_ITEMS = REGISTRY.counter(
+    "dpr_batch_items_total", "Items received by /process_batch per acknowledgement status.", ("status",))
+
+
+class BatchError(ValueError):
+    """The batch as a whole cannot be read."""
+
+
+def decode_batch(body: bytes, content_encoding: Optional[str] = None) -> dict:
+    """
+    Parse a (possibly gzip-compressed) batch body.
+
+    Raises:
+        BatchError: If the body is not valid gzip/JSON, too large, or has no item list
+    """
+    if content_encoding and content_encoding.strip().lower() == "gzip":
+        # Bounded inflate, so a small compressed body cannot expand without limit.
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, MAX_BATCH_BYTES + 1)
+        except zlib.error as e:
+            raise BatchError(f"Invalid gzip body: {e}")
+        if len(body) > MAX_BATCH_BYTES or inflater.unconsumed_tail:
+            raise BatchError(f"Batch larger than {MAX_BATCH_BYTES} bytes")
+    elif len(body) > MAX_BATCH_BYTES:
+        raise BatchError(f"Batch larger than {MAX_BATCH_BYTES} bytes")
+    try:
+        data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise BatchError("Invalid JSON format")
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        raise BatchError("Batch must be an object with an 'items' list")
+    if len(data["items"]) > MAX_BATCH_ITEMS:
+        raise BatchError(f"At most {MAX_BATCH_ITEMS} items per batch")
+    batch_priority(data)
+    return data
+
+
+def batch_priority(data: dict) -> int:
+    """
+    Scheduling priority of a decoded batch, BULK unless it says otherwise.
+
+    Raises:
+        BatchError: If the priority is not one of PRIORITY_NAMES
+    """
+    name = data.get("priority") or PRIORITY_NAMES[BULK]
+    for priority, priority_name in PRIORITY_NAMES.items():
+        if name == priority_name:
+            return priority
+    raise BatchError(f"priority must be one of {sorted(PRIORITY_NAMES.values())}")
+
+
+def encode_batch(items: List[dict], project: Optional[str] = None, priority: Optional[int] = None) -> bytes:
+    """gzip-compressed JSON body for /process_batch (the counterpart of decode_batch)."""
+    payload = {"items": items}
+    if project:
+        payload["project"] = project
+    if priority is not None:
+        payload["priority"] = PRIORITY_NAMES[priority]
+    return gzip.compress(json.dumps(payload).encode("utf-8"))
+
+
+async def process_item(item: dict, project: Project, priority: int = BULK) -> dict:
+    item_id = item.get("id") if isinstance(item, dict) else None
+    transcription = item.get("transcription") if isinstance(item, dict) else None
+    if not item_id or not transcription or not item.get("sheet_name"):
+        return {"id": item_id, "status": "rejected", "error": "id, transcription and sheet_name are required"}
+
+    sheet_name = item["sheet_name"]
+    name = item.get("name", "")
+    location = item.get("location", "")
+    # Same key as a /process call with idempotency_key=id, so both paths dedupe against each other.
+    key, _ = submission_keys([transcription], client_key=str(item_id), project=project.project_id,
+                             timestamp=parse_timestamp(item.get("timestamp")))[0]
+    try:
+        result, duplicate = await run_once(
+            get_dedupe_store(), key,
+            lambda: updated_quantity_in_sheet(transcription, sheet_name, name, location,
+                                              project=project, priority=priority))
+    except Exception as e:
+        logger.error(f"batch item {item_id} failed: {str(e)}")
+        return {"id": item_id, "status": "error", "error": str(e)}
+    return {"id": item_id, "status": "duplicate" if duplicate else "ok", "result": result}
+
+
+async def process_batch(items: List[dict], project: Project, priority: int = BULK) -> List[dict]:
+    """
+    Process every item of a batch and return one acknowledgement per item, in order.
+
+    Items run concurrently; the project's concurrency limit and write lock
+    keep LLM calls and workbook writes bounded. Batches are scheduled as
+    BULK by default so live reports are not held up behind a device catching up.
+    """
+    acks = await asyncio.gather(*(process_item(item, project, priority) for item in items))
+    for ack in acks:
+        BATCH_ITEMS.inc(status=ack["status"])
+    return list(acks)
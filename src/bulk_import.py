@@ -0,0 +1,178 @@
+"""
+Bulk import of historical reports (paper DPRs, WhatsApp exports).
+
+An upload is a CSV file with a header row or a JSONL file with one object per
+line. The columns/keys are the ones of a /process_batch item:
+
+- transcription (or text / body): the report text, required
+- sheet_name, name, location: fall back to the values given with the upload
+- date: optional, appended to the text so the extraction picks it up
+- id (or request_id): optional idempotency key; defaults to the line number
+  plus a hash of the line, so re-uploading the same file does not double count
+
+The upload is spooled to a temporary file first and then read one record at
+a time; at most `concurrency` records are being processed at once and every
+result is yielded as soon as it is ready, so memory stays flat no matter how
+large the file is.
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import tempfile
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from config.configuration import MAX_IMPORT_BYTES, BULK_IMPORT_CONCURRENCY
+from src.batch import BatchError, process_item
+from src.llm_scheduler import BULK
+from src.projects import Project
+from utils.logger import get_logger
+from utils.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+IMPORT_RECORDS = REGISTRY.counter(
+    "dpr_import_records_total", "Records processed by /import per result status.", ("status",))
+
+TEXT_FIELDS = ("transcription", "text", "body")
+ID_FIELDS = ("id", "request_id")
+
+# Records still being processed when a client disconnects finish in the
+# background; keep references so they are not garbage collected.
+_detached = set()
+
+
+async def spool_upload(chunks: AsyncIterator[bytes], max_bytes: int = MAX_IMPORT_BYTES):
+    """
+    Copy a streamed upload into a temporary file.
+
+    Raises:
+        BatchError: If the upload is larger than `max_bytes`
+    """
+    spool = tempfile.TemporaryFile()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise BatchError(f"Upload larger than {max_bytes} bytes")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def detect_format(fmt: Optional[str], content_type: Optional[str], spool) -> str:
+    """'csv' or 'jsonl', from the explicit format, the content type, or the first byte."""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in ("csv", "jsonl"):
+            raise BatchError("format must be csv or jsonl")
+        return fmt
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "jsonl"
+    head = spool.read(256).lstrip(b"\xef\xbb\xbf \t\r\n")
+    spool.seek(0)
+    return "jsonl" if head.startswith(b"{") else "csv"
+
+
+def iter_records(spool, fmt: str) -> Iterator[Tuple[int, Optional[dict], str]]:
+    """
+    Yield (line_number, record, raw) per record; record is None when the line
+    cannot be parsed, and raw is what the default idempotency key hashes.
+    """
+    text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            raw = json.dumps(record, sort_keys=True)
+            yield reader.line_num, {k.strip().lower(): v for k, v in record.items() if k}, raw
+        return
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None, line
+            continue
+        yield line_number, record if isinstance(record, dict) else None, line
+
+
+def to_item(line_number: int, record: dict, raw: str, defaults: dict) -> dict:
+    """Map an import record onto a /process_batch item."""
+    text = next((str(record[f]).strip() for f in TEXT_FIELDS if record.get(f)), "")
+    if text and record.get("date"):
+        text = f"{text} (date: {record['date']})"
+    item_id = next((str(record[f]) for f in ID_FIELDS if record.get(f)), None)
+    if item_id is None:
+        item_id = f"import:{line_number}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]}"
+    return {
+        "id": item_id,
+        "transcription": text,
+        "sheet_name": record.get("sheet_name") or defaults.get("sheet_name", ""),
+        "name": record.get("name") or defaults.get("name", ""),
+        "location": record.get("location") or defaults.get("location", ""),
+    }
+
+
+async def import_records(spool, fmt: str, project: Project, defaults: Optional[dict] = None,
+                         concurrency: int = BULK_IMPORT_CONCURRENCY) -> AsyncIterator[dict]:
+    """
+    Process every record of a spooled upload and yield one result per record
+    as it completes, followed by a summary.
+
+    Args:
+        spool: Binary file positioned at the start of the upload (closed when done)
+        fmt: 'csv' or 'jsonl'
+        project: Project whose workbook is updated
+        defaults: sheet_name / name / location for records that do not set them
+        concurrency: Records in flight at once
+    """
+    defaults = defaults or {}
+    counts = {"ok": 0, "duplicate": 0, "rejected": 0, "error": 0}
+    pending = set()
+
+    async def run(line_number, item):
+        ack = await process_item(item, project, BULK)
+        return {"line": line_number, **ack}
+
+    def finished(task):
+        result = task.result()
+        counts[result["status"]] += 1
+        IMPORT_RECORDS.inc(status=result["status"])
+        return result
+
+    try:
+        for line_number, record, raw in iter_records(spool, fmt):
+            if record is None:
+                counts["rejected"] += 1
+                IMPORT_RECORDS.inc(status="rejected")
+                yield {"line": line_number, "id": None, "status": "rejected", "error": "Invalid record"}
+                continue
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield finished(task)
+            pending.add(asyncio.ensure_future(run(line_number, to_item(line_number, record, raw, defaults))))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield finished(task)
+        yield {"summary": counts}
+    finally:
+        spool.close()
+        if pending:
+            # The client went away. Cancelling could interrupt a workbook write
+            # after the cell was updated, so let in-flight records finish.
+            logger.warning(f"import stopped with {len(pending)} records in flight")
+            for task in pending:
+                _detached.add(task)
+                task.add_done_callback(_detached.discard)
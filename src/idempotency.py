@@ -0,0 +1,333 @@
+"""
+Idempotent report submission.
+
+`update_sheet` adds the reported quantity to the cell, so a phone that retries
+a `/process` call after a tunnel timeout would count the work twice. Every
+report therefore gets an idempotency key, which is claimed in a persistent
+SQLite store before any LLM or workbook work starts:
+
+- a new key runs the pipeline and stores its result
+- a key that already finished returns the stored result immediately
+- a key that is still running waits for the first attempt to finish
+- a key whose attempt failed is released, so the retry runs for real, unless
+  the cell had already been written (`mark_written`): then the key stays and
+  retries get the written result, even if logging failed afterwards
+- a key left pending by a process that died (restarted, or older than the
+  lease) is abandoned: the next claim takes it over
+
+Keys are either supplied by the client (`Idempotency-Key` header or
+`idempotency_key` in the body) or derived from the report itself: project,
+sheet, name, location, text and a time bucket. Entries expire after a TTL.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from config.configuration import DEDUPE_DB, DEDUPE_TTL_SECONDS, DEDUPE_BUCKET_SECONDS, DEDUPE_LEASE_SECONDS
+from utils.logger import get_logger
+from utils.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+WRITTEN = "written"
+DONE = "done"
+# States whose cell update has happened; their key is never released
+FINISHED = (WRITTEN, DONE)
+
+class SubmissionInProgress(TimeoutError):
+    """A retry gave up waiting for the original attempt of its submission."""
+
+
+# (store, key) of the submission the current task is running, for mark_written
+_claim: ContextVar[Optional[Tuple["DedupeStore", str]]] = ContextVar("dpr_claim", default=None)
+
+
+def derive_key(text: str, position: int = 0, sheet_name: str = "", name: str = "", location: str = "",
+               project: str = "", timestamp: Optional[float] = None,
+               bucket_seconds: int = DEDUPE_BUCKET_SECONDS) -> str:
+    """Key for a report that arrived without one; identical reports in the same time bucket collide."""
+    bucket = int((timestamp if timestamp is not None else time.time()) // bucket_seconds)
+    normalized = " ".join(str(text).lower().split())
+    raw = json.dumps([project, sheet_name, name, location, position, normalized, bucket])
+    return "derived:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """Epoch seconds from a client `timestamp` (number or ISO 8601 string), None if unusable."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def submission_keys(transcriptions: List[str], client_key: Optional[str] = None, sheet_name: str = "",
+                    name: str = "", location: str = "", project: str = "",
+                    timestamp: Optional[float] = None) -> List[Tuple[str, Tuple[str, ...]]]:
+    """
+    One (key, alternate_keys) pair per transcription of a `/process` payload.
+
+    A client key covers the whole payload, so each transcription gets its
+    position appended. Derived keys use the client's timestamp when it sent
+    one; otherwise the server clock, and the previous bucket is checked as
+    well so a retry that crosses a bucket boundary is still caught.
+    """
+    if client_key:
+        return [(f"client:{project}:{client_key}:{i}", ()) for i in range(len(transcriptions))]
+    keys = []
+    for i, text in enumerate(transcriptions):
+        fields = dict(position=i, sheet_name=sheet_name, name=name, location=location, project=project)
+        if timestamp is not None:
+            keys.append((derive_key(text, timestamp=timestamp, **fields), ()))
+        else:
+            now = time.time()
+            keys.append((derive_key(text, timestamp=now, **fields),
+                         (derive_key(text, timestamp=now - DEDUPE_BUCKET_SECONDS, **fields),)))
+    return keys
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill cannot probe a process on Windows; rely on the lease there.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DedupeStore:
+    """
+    SQLite-backed key -> result store with a TTL.
+
+    Pending claims record their owner (host, process ID and a per-store
+    token). A pending claim is abandoned when its owner was an earlier store
+    of this process ID (a restart), a process on this host that is gone, or
+    when it is older than `lease` and not running in this store.
+    """
+
+    def __init__(self, path: str = DEDUPE_DB, ttl: float = DEDUPE_TTL_SECONDS,
+                 lease: float = DEDUPE_LEASE_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Keys this store claimed whose attempt has not finished yet
+        self._running = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " key TEXT PRIMARY KEY, state TEXT NOT NULL, result TEXT, created_at REAL NOT NULL, owner TEXT)")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(submissions)")]
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE submissions ADD COLUMN owner TEXT")
+        self._claims = 0
+        self.purge_expired()
+        self.purge_abandoned()
+
+    def _abandoned(self, key: str, owner: Optional[str], created_at: float, now: float) -> bool:
+        """Whether a pending claim's attempt can no longer finish."""
+        if owner == self.owner:
+            return key not in self._running and created_at < now - self.lease
+        if created_at < now - self.lease or owner is None:
+            return True
+        host, pid, _ = owner.rsplit(":", 2)
+        own_host, own_pid, _ = self.owner.rsplit(":", 2)
+        return host == own_host and (pid == own_pid or not _process_alive(int(pid)))
+
+    def purge_abandoned(self) -> int:
+        """Drop pending claims left behind by processes that died, e.g. before a restart."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT key, owner, created_at FROM submissions WHERE state = ?",
+                                      (PENDING,)).fetchall()
+            stale = [(key, owner, created_at) for key, owner, created_at in rows
+                     if self._abandoned(key, owner, created_at, now)]
+            for key, owner, created_at in stale:
+                self._conn.execute("DELETE FROM submissions WHERE key = ? AND state = ? AND owner IS ?"
+                                   " AND created_at = ?", (key, PENDING, owner, created_at))
+        if stale:
+            logger.warning(f"dropped {len(stale)} abandoned pending submissions")
+        return len(stale)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM submissions WHERE created_at < ?",
+                                        (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def claim(self, key: str) -> Tuple[bool, Optional[str], Optional[dict]]:
+        """
+        Try to take ownership of `key`.
+
+        Returns:
+            (claimed, state, result): claimed is True when the caller must do
+            the work; otherwise state/result describe the existing entry.
+        """
+        now = time.time()
+        with self._lock:
+            self._claims += 1
+            if self._claims % 500 == 0:
+                self._conn.execute("DELETE FROM submissions WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute("DELETE FROM submissions WHERE key = ? AND created_at < ?", (key, now - self.ttl))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO submissions (key, state, created_at, owner) VALUES (?, ?, ?, ?)",
+                (key, PENDING, now, self.owner))
+            if cursor.rowcount == 1:
+                self._running.add(key)
+                return True, None, None
+            row = self._conn.execute("SELECT state, result, owner, created_at FROM submissions WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is not None and row[0] == PENDING and self._abandoned(key, row[2], row[3], now):
+                # Only take over the claim we looked at, not one that changed in between.
+                cursor = self._conn.execute(
+                    "UPDATE submissions SET owner = ?, created_at = ? WHERE key = ? AND state = ?"
+                    " AND owner IS ? AND created_at = ?", (self.owner, now, key, PENDING, row[2], row[3]))
+                if cursor.rowcount == 1:
+                    self._running.add(key)
+                    logger.warning(f"taking over abandoned submission {key} from {row[2]}")
+                    return True, None, None
+        if row is None:
+            # Released between our insert and select; let the caller try again.
+            return self.claim(key)
+        state, result = row[0], row[1]
+        return False, state, json.loads(result) if result else None
+
+    def lookup(self, key: str) -> Tuple[Optional[str], Optional[dict]]:
+        with self._lock:
+            row = self._conn.execute("SELECT state, result, created_at, owner FROM submissions WHERE key = ?",
+                                     (key,)).fetchone()
+            now = time.time()
+            if row is None or row[2] < now - self.ttl:
+                return None, None
+            if row[0] == PENDING and self._abandoned(key, row[3], row[2], now):
+                # Nothing will ever finish it; do not make retries wait for it.
+                return None, None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def complete(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._running.discard(key)
+            self._conn.execute("UPDATE submissions SET state = ?, result = ? WHERE key = ?",
+                               (DONE, json.dumps(result, default=str), key))
+
+    def mark_written(self, key: str, result: dict) -> None:
+        """The cell update of `key` happened; keep the key even if the attempt fails later."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO submissions (key, state, result, created_at, owner) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET state = excluded.state, result = excluded.result",
+                (key, WRITTEN, json.dumps(result, default=str), time.time(), self.owner))
+
+    def release(self, key: str) -> None:
+        """Forget a failed attempt so a retry can run (only before its cell was written)."""
+        with self._lock:
+            self._running.discard(key)
+            self._conn.execute("DELETE FROM submissions WHERE key = ? AND state = ? AND owner = ?",
+                               (key, PENDING, self.owner))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+async def run_once(store: DedupeStore, key: str, work: Callable[[], Awaitable[dict]],
+                   alternate_keys: Tuple[str, ...] = (), wait_timeout: float = DEDUPE_LEASE_SECONDS,
+                   poll_interval: float = 0.2) -> Tuple[dict, bool]:
+    """
+    Run `work` at most once per key.
+
+    Args:
+        store: The dedupe store
+        key: Key to claim for this submission
+        work: Coroutine factory doing the LLM and workbook update; returns a JSON-able result
+        alternate_keys: Extra keys of the same submission (e.g. the previous time bucket);
+            finished ones are duplicates, pending ones are waited for like the key itself
+        wait_timeout: How long a duplicate waits for an in-flight original
+
+    Returns:
+        (result, duplicate): duplicate is True when the stored result was returned
+
+    Raises:
+        SubmissionInProgress: If the original attempt is still running after `wait_timeout`
+    """
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        in_flight = False
+        for other in alternate_keys:
+            state, result = store.lookup(other)
+            if state in FINISHED:
+                CACHE_HITS.inc(cache="idempotency")
+                return result, True
+            in_flight = in_flight or state == PENDING
+        if not in_flight:
+            claimed, state, result = store.claim(key)
+            if claimed:
+                break
+            if state in FINISHED:
+                CACHE_HITS.inc(cache="idempotency")
+                logger.info(f"duplicate submission {key}, returning stored result")
+                return result, True
+        if time.monotonic() > deadline:
+            raise SubmissionInProgress(f"submission {key} is still being processed")
+        # The original attempt is in flight; wait for it instead of running twice.
+        await asyncio.sleep(poll_interval)
+
+    CACHE_MISSES.inc(cache="idempotency")
+    token = _claim.set((store, key))
+    try:
+        result = await work()
+    except BaseException:
+        # A no-op once the cell was written: a retry must not add the quantity again.
+        store.release(key)
+        raise
+    finally:
+        _claim.reset(token)
+    store.complete(key, result)
+    return result, False
+
+
+def mark_written(result: dict) -> None:
+    """
+    Record that the submission being run by `run_once` has written its cell,
+    with the result retries should get. Called right after the write, in the
+    same thread; outside of `run_once` it does nothing.
+    """
+    claim = _claim.get()
+    if claim is not None:
+        store, key = claim
+        store.mark_written(key, result)
+
+
+_store: Optional[DedupeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_dedupe_store() -> DedupeStore:
+    """The process-wide store, opened on first use (path from DPR_DEDUPE_DB)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DedupeStore(os.getenv("DPR_DEDUPE_DB") or DEDUPE_DB)
+    return _store
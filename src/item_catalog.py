@@ -0,0 +1,134 @@
+"""
+Workbook-level catalog of BOQ items with stable IDs.
+
+Every monthly sheet repeats the same BOQ descriptions, so they are
+deduplicated across sheets into items. An item ID is a hash of the
+normalized description, so the same line gets the same ID in every month
+and in every rebuild; the n-th repeat of a description within one sheet gets
+an `-n` suffix. Each item maps to its row on every sheet it appears on.
+
+The LLM is shown the catalog's (item ID, description) list and answers with
+an item ID, which is then resolved to the row of the sheet being updated.
+The catalog `key` only depends on the items, not on the sheets, so anything
+derived from the list (the rendered prompt block, caches keyed on it) stays
+valid when a new month sheet with the same items is added.
+"""
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from src.workbook_index import WorkbookIndex, get_workbook_index
+from utils.logger import get_logger
+from utils.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = get_logger(__name__)
+
+ID_LENGTH = 8
+
+_catalogs: Dict[str, "ItemCatalog"] = {}
+_rendered: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def normalize_description(text) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def item_id_for(description, occurrence: int = 1, length: int = ID_LENGTH) -> str:
+    """Stable ID of a description; `occurrence` > 1 marks a repeat within the same sheet."""
+    digest = hashlib.sha1(normalize_description(description).encode("utf-8")).hexdigest()[:length]
+    return digest if occurrence == 1 else f"{digest}-{occurrence}"
+
+
+@dataclass(frozen=True)
+class SheetItems:
+    """The items of one sheet; the dependency the extraction agent validates against."""
+    sheet_name: str
+    rows: Dict[str, int]
+
+    def row_for(self, item_id: str) -> int:
+        try:
+            return self.rows[item_id.strip()]
+        except KeyError:
+            raise KeyError(f"Item {item_id} is not on sheet {self.sheet_name}.") from None
+
+
+@dataclass(frozen=True)
+class ItemCatalog:
+    file_path: str
+    version: Tuple[int, int]
+    # item ID -> description, in order of first appearance
+    items: Dict[str, str]
+    # sheet name -> {item ID: row}
+    sheets: Dict[str, Dict[str, int]]
+    key: str
+
+    def for_sheet(self, sheet_name: str) -> SheetItems:
+        try:
+            return SheetItems(sheet_name, self.sheets[sheet_name])
+        except KeyError:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.") from None
+
+    def locations(self, item_id: str) -> Dict[str, int]:
+        """Sheet -> row of an item across the whole workbook."""
+        return {sheet: rows[item_id] for sheet, rows in self.sheets.items() if item_id in rows}
+
+    def render(self) -> str:
+        """The (item ID, description) list shown to the LLM, rendered once per catalog key."""
+        rendered = _rendered.get(self.key)
+        if rendered is None:
+            rendered = str(list(self.items.items()))
+            with _lock:
+                _rendered[self.key] = rendered
+        return rendered
+
+
+def build_item_catalog(index: WorkbookIndex) -> ItemCatalog:
+    """Deduplicate the descriptions of every dated sheet of an index into items."""
+    items: Dict[str, str] = {}
+    sheets: Dict[str, Dict[str, int]] = {}
+    for sheet in index.sheets.values():
+        if not sheet.date_columns:
+            # LOGS and other sheets without daily columns never receive updates
+            continue
+        rows, seen = {}, {}
+        for row, description in sheet.descriptions:
+            normalized = normalize_description(description)
+            seen[normalized] = seen.get(normalized, 0) + 1
+            item_id = item_id_for(description, seen[normalized])
+            if item_id in items and normalize_description(items[item_id]) != normalized:
+                # Hash prefix collision between two different descriptions
+                item_id = item_id_for(description, seen[normalized], length=2 * ID_LENGTH)
+            items.setdefault(item_id, str(description).strip())
+            rows[item_id] = row
+        sheets[sheet.name] = rows
+
+    key = hashlib.sha1(repr(sorted(items.items())).encode("utf-8")).hexdigest()[:16]
+    logger.info(f"item catalog {key}: {len(items)} items across {len(sheets)} sheets")
+    return ItemCatalog(file_path=index.file_path, version=index.version, items=items, sheets=sheets, key=key)
+
+
+def catalog_for_index(index: WorkbookIndex) -> ItemCatalog:
+    """The catalog of a given index, built once per index version."""
+    path = os.path.abspath(index.file_path)
+    catalog = _catalogs.get(path)
+    if catalog is not None and catalog.version == index.version:
+        CACHE_HITS.inc(cache="item_catalog")
+        return catalog
+    CACHE_MISSES.inc(cache="item_catalog")
+    catalog = build_item_catalog(index)
+    with _lock:
+        current = _catalogs.get(path)
+        if current is None or current.version <= catalog.version:
+            _catalogs[path] = catalog
+        if current is not None and current.key != catalog.key:
+            # The items changed; the old rendering is not needed anymore
+            _rendered.pop(current.key, None)
+    return catalog
+
+
+def get_item_catalog(file_path: str) -> ItemCatalog:
+    """The catalog of the workbook's current index, rebuilt only when the index changes."""
+    return catalog_for_index(get_workbook_index(file_path))
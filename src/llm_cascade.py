@@ -0,0 +1,118 @@
+"""
+Two-tier model cascade: a small, fast model first, the large chain only when needed.
+
+Most reports are easy matches, so they are sent to the fast tier first. The
+fast model answers with the same fields as the large one plus a confidence
+score for the item it picked. Its answer is accepted when the confidence is at
+least `min_confidence` and the item is on the sheet being updated. Otherwise
+the report is escalated to the large tier (the hedged provider chain), and the
+reason is counted:
+
+- low_confidence: confidence below the threshold
+- invalid_item:   the item ID is not in the description set of the sheet
+- timeout:        no answer within `fast_timeout` seconds of getting a
+                  rate-limit slot (queueing for the slot does not count)
+- saturated:      every fast provider is out of rate-limit budget, so the report
+                  goes straight to the large models instead of waiting twice
+- error:          every fast provider failed
+
+Escalations skip the fast-tier models in the large chain, so a report is not
+hedged onto the model that just gave up on it (unless nothing else is left).
+
+The escalation rate is dpr_llm_cascade_escalations_total divided by
+dpr_llm_cascade_requests_total.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from config.configuration import CASCADE_MIN_CONFIDENCE, CASCADE_FAST_TIMEOUT
+from src.llm_providers import Provider, hedged_run
+from src.llm_scheduler import INTERACTIVE
+from utils.logger import get_logger
+from utils.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+CASCADE_REQUESTS = REGISTRY.counter(
+    "dpr_llm_cascade_requests_total", "Reports sent to the fast tier of the model cascade.")
+CASCADE_ESCALATIONS = REGISTRY.counter(
+    "dpr_llm_cascade_escalations_total", "Reports escalated from the fast tier to the large models.", ("reason",))
+
+
+@dataclass(frozen=True)
+class CascadeSettings:
+    min_confidence: float = CASCADE_MIN_CONFIDENCE
+    fast_timeout: float = CASCADE_FAST_TIMEOUT
+
+    @classmethod
+    def from_env(cls) -> "CascadeSettings":
+        """Thresholds from LLM_CASCADE_MIN_CONFIDENCE and LLM_FAST_TIMEOUT."""
+        return cls(
+            min_confidence=float(os.getenv("LLM_CASCADE_MIN_CONFIDENCE", CASCADE_MIN_CONFIDENCE)),
+            fast_timeout=float(os.getenv("LLM_FAST_TIMEOUT", CASCADE_FAST_TIMEOUT)),
+        )
+
+
+def escalation_reason(output, is_valid_item: Callable[[str], bool], min_confidence: float) -> Optional[str]:
+    """Why a fast-tier answer cannot be used, or None when it can."""
+    if not is_valid_item(output.item_id):
+        return "invalid_item"
+    if output.confidence < min_confidence:
+        return "low_confidence"
+    return None
+
+
+async def cascade_run(fast: List[Provider], large: List[Provider], prompt: str,
+                      is_valid_item: Callable[[str], bool], priority: int = INTERACTIVE,
+                      deps=None, prompt_tokens: Optional[int] = None,
+                      settings: Optional[CascadeSettings] = None) -> Tuple[object, Provider, List[tuple]]:
+    """
+    Run `prompt` on the fast tier and escalate to the large tier when its
+    answer is not good enough.
+
+    Args:
+        fast: Fast-tier providers (their output carries a `confidence`); empty skips the fast tier
+        large: The hedged large-model chain
+        is_valid_item: Whether an item ID is in the description set of the sheet
+        deps: Passed to the large-tier agents
+
+    Returns:
+        tuple: (response, provider, fast_attempts) of the answer that was used;
+            fast_attempts holds the (response, provider) of a fast answer that
+            was escalated, so its token usage can still be recorded
+    """
+    if not fast:
+        response, provider = await hedged_run(large, prompt, priority, deps=deps, prompt_tokens=prompt_tokens)
+        return response, provider, []
+
+    settings = settings or CascadeSettings.from_env()
+    CASCADE_REQUESTS.inc()
+    attempts = []
+    fast_models = {provider.model_name for provider in fast}
+    large = [provider for provider in large if provider.model_name not in fast_models] or large
+    if all(provider.saturated for provider in fast):
+        reason = "saturated"
+    else:
+        try:
+            response, provider = await hedged_run(fast, prompt, priority, prompt_tokens=prompt_tokens,
+                                                  timeout=settings.fast_timeout)
+        except asyncio.TimeoutError:
+            reason = "timeout"
+        except Exception as e:
+            logger.warning(f"fast tier failed: {str(e)}")
+            reason = "error"
+        else:
+            reason = None
+    if reason is None:
+        reason = escalation_reason(response.output, is_valid_item, settings.min_confidence)
+        if reason is None:
+            return response, provider, []
+        attempts.append((response, provider))
+        logger.info(f"escalating ({reason}): {provider.model_name} answered {response.output.item_id} "
+                    f"with confidence {response.output.confidence:.2f}")
+
+    CASCADE_ESCALATIONS.inc(reason=reason)
+    response, provider = await hedged_run(large, prompt, priority, deps=deps, prompt_tokens=prompt_tokens)
+    return response, provider, attempts
@@ -0,0 +1,289 @@
+"""
+Provider chain for the extraction agent: hedged requests, failover and circuit breaking.
+
+The chain is an ordered list of models (primary first). A request goes to
+the first healthy provider; if it has not answered within that provider's
+hedge delay, the same prompt is also sent to the next one, and the first
+valid result wins. A provider that errors hands over to the next one
+immediately. Providers that keep failing are skipped by a circuit breaker
+until a cooldown has passed.
+
+The hedge delay comes from each provider's own latency history (a high
+percentile of its recent successful calls), so it follows real latency
+instead of a fixed guess. Every provider call goes through that provider's
+rate-limit scheduler (see src/llm_scheduler.py).
+
+Provider SDK clients share one pooled HTTP client (`get_http_client`) whose
+idle connections are kept for LLM_KEEPALIVE_SECONDS, so `open_connection`
+can set up the TLS connection before the first request needs it.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+from config.configuration import LLM_KEEPALIVE_SECONDS
+from src.llm_scheduler import LLMScheduler, INTERACTIVE, OUTPUT_TOKEN_ESTIMATE, estimate_tokens
+from utils.logger import get_logger
+from utils.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "dpr_llm_request_duration_seconds", "Latency of successful LLM calls per model.", ("model",))
+LLM_HEDGES = REGISTRY.counter(
+    "dpr_llm_hedged_requests_total", "Requests sent to a secondary model because the first was slow.", ("model",))
+LLM_PROVIDER_FAILURES = REGISTRY.counter(
+    "dpr_llm_provider_failures_total", "LLM calls that raised, per model.", ("model",))
+LLM_WINS = REGISTRY.counter(
+    "dpr_llm_provider_wins_total", "Requests answered by each model.", ("model",))
+LLM_CIRCUIT_OPEN = REGISTRY.counter(
+    "dpr_llm_circuit_open_total", "Times a model's circuit breaker opened.", ("model",))
+
+_http_client = None
+_http_lock = threading.Lock()
+
+
+def get_http_client():
+    """The pooled async HTTP client shared by the provider SDKs (httpx is imported on first use)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        with _http_lock:
+            if _http_client is None or _http_client.is_closed:
+                _http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(timeout=600, connect=5),
+                    limits=httpx.Limits(keepalive_expiry=LLM_KEEPALIVE_SECONDS))
+    return _http_client
+
+
+async def open_connection(url: str, timeout: float = 5.0) -> bool:
+    """
+    Open a pooled connection to `url` with a HEAD request (DNS, TCP and TLS
+    are paid here instead of by the next LLM call). Any HTTP response counts
+    as connected; errors are logged and return False.
+    """
+    import httpx
+
+    try:
+        await get_http_client().head(url, timeout=timeout)
+    except httpx.HTTPError as e:
+        logger.warning(f"could not open connection to {url}: {str(e)}")
+        return False
+    logger.info(f"connection to {url} ready")
+    return True
+
+
+class ProviderStats:
+    """Rolling latency window of successful calls."""
+
+    def __init__(self, window: int = 100, min_samples: int = 5, initial_delay: float = 4.0,
+                 percentile: float = 90, min_delay: float = 0.5, max_delay: float = 20.0):
+        self.latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this provider before hedging to the next one."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return min(self.max_delay, max(self.min_delay, samples[index]))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and stays open for
+    `cooldown` seconds; then a single trial call is let through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.cooldown and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release_trial(self) -> None:
+        """The trial call ended without a verdict (it was cancelled); the next call may be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None:
+                # failed trial call: start a new cooldown
+                self.opened_at = self.clock()
+                return False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                return True
+            return False
+
+
+class Provider:
+    """One model of the chain with its agent, latency stats and circuit breaker."""
+
+    def __init__(self, model_name: str, agent_factory: Callable[[str], object],
+                 stats: Optional[ProviderStats] = None, breaker: Optional[CircuitBreaker] = None,
+                 scheduler: Optional[LLMScheduler] = None):
+        self.model_name = model_name
+        self._agent_factory = agent_factory
+        self._agent = None
+        self._lock = threading.Lock()
+        self.stats = stats or ProviderStats()
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler or LLMScheduler.from_env(model_name)
+
+    @property
+    def agent(self):
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._agent_factory(self.model_name)
+        return self._agent
+
+    async def run(self, prompt: str, priority: int = INTERACTIVE, deps=None, prompt_tokens: Optional[int] = None,
+                  timeout: Optional[float] = None):
+        """
+        Run the agent once a rate-limit slot is granted. `timeout` bounds the
+        call itself; time spent queueing for the slot does not count.
+        """
+        timing = {}
+
+        async def call():
+            timing["start"] = time.perf_counter()
+            if timeout is None:
+                return await self.agent.run(prompt, deps=deps)
+            return await asyncio.wait_for(self.agent.run(prompt, deps=deps), timeout)
+
+        tokens = (prompt_tokens or estimate_tokens(prompt)) + OUTPUT_TOKEN_ESTIMATE
+        try:
+            response = await self.scheduler.run(call, tokens=tokens, priority=priority)
+        except asyncio.CancelledError:
+            # A hedge that lost says nothing about this provider's health.
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            LLM_PROVIDER_FAILURES.inc(model=self.model_name)
+            if self.breaker.record_failure():
+                LLM_CIRCUIT_OPEN.inc(model=self.model_name)
+                logger.warning(f"circuit opened for {self.model_name}")
+            raise
+        # Latency of the call itself; time spent queueing for a rate-limit slot is excluded.
+        elapsed = time.perf_counter() - timing["start"]
+        self.scheduler.settle(tokens, response.usage().total_tokens)
+        self.stats.record(elapsed)
+        self.breaker.record_success()
+        LLM_REQUEST_SECONDS.observe(elapsed, model=self.model_name)
+        return response
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new call would have to wait for rate-limit budget."""
+        return self.scheduler.saturated
+
+    def __repr__(self):
+        return f"Provider({self.model_name!r})"
+
+
+async def hedged_run(providers: List[Provider], prompt: str, priority: int = INTERACTIVE,
+                     deps=None, prompt_tokens: Optional[int] = None,
+                     timeout: Optional[float] = None) -> Tuple[object, Provider]:
+    """
+    Run `prompt` against the chain and return (response, provider) of the first
+    valid answer. `deps` is passed to every agent run; `prompt_tokens` is a
+    precomputed token estimate for rate limiting; `timeout` bounds each call
+    once it has its rate-limit slot. Raises the last error when every
+    provider failed.
+    """
+    pending = {}
+    queue = list(providers)
+    last_error: Optional[BaseException] = None
+
+    def start(provider):
+        task = asyncio.ensure_future(provider.run(prompt, priority, deps, prompt_tokens, timeout))
+        # Covers a hedge cancelled before it started running (Provider.run never saw it).
+        task.add_done_callback(lambda t: t.cancelled() and provider.breaker.release_trial())
+        pending[task] = provider
+        return provider
+
+    def launch():
+        # Only ask a breaker when its provider is really launched: a half-open
+        # breaker hands out a single trial call.
+        while queue:
+            provider = queue.pop(0)
+            if provider.breaker.allow():
+                return start(provider)
+        return None
+
+    current = launch()
+    if current is None:
+        # Every circuit is open: still try the primary rather than failing outright.
+        current = start(providers[0])
+    try:
+        while pending:
+            hedge_wait = current.stats.hedge_delay() if queue else None
+            done, _ = await asyncio.wait(pending, timeout=hedge_wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # The newest request is slow: hedge to the next provider.
+                hedge = launch()
+                if hedge is not None:
+                    current = hedge
+                    LLM_HEDGES.inc(model=current.model_name)
+                    logger.info(f"hedging to {current.model_name} after {hedge_wait:.2f}s")
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                if task.exception() is None:
+                    LLM_WINS.inc(model=provider.model_name)
+                    return task.result(), provider
+                last_error = task.exception()
+                logger.warning(f"{provider.model_name} failed: {str(last_error)}")
+            if queue and not pending:
+                # Fail over right away instead of waiting for a hedge delay.
+                current = launch() or current
+            elif pending:
+                current = list(pending.values())[-1]
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise last_error
@@ -3,40 +3,236 @@ this is the file containig Tools & Dependency Injection Example usign pydantic
 """
 
 import asyncio
-from pydantic_ai import Agent
+import os
+import threading
+import time
 from dotenv import load_dotenv
 from typing import Optional
 from pydantic import BaseModel, Field
-from src.prompt import prompt_builder
+from src.prompt import build_prompt
+from src.item_catalog import SheetItems, get_item_catalog
+from config.configuration import FILE_PATH, SHEET_NAME
 from utils.logger import get_logger
+from src.llm_providers import Provider, get_http_client, open_connection
+from src.llm_cascade import cascade_run
+from src.llm_scheduler import LLMScheduler, INTERACTIVE, estimate_tokens
+from utils.metrics import span, emit_event, REGISTRY, LLM_INPUT_TOKENS, LLM_OUTPUT_TOKENS, LLM_RETRIES
 import datetime
 logger = get_logger(__name__)
 
 load_dotenv()
 
 class SupportResult(BaseModel):
-    relvant_index: int = Field(description="provided index of the serachable description from the given list of the descriptions")
+    item_id: str = Field(description="item id of the best matching description from the given list of the descriptions")
     updated_quantity: float = Field(description="updated quantity of the work done which provided in the search description")
     date: Optional[datetime.date] = Field(default=datetime.date.today(), description="date of the work done, current year is 2025, None if date is not provided, if given today in description then go with default value.")
 
-support_agent = Agent("groq:llama-3.3-70b-versatile",
-    output_type=SupportResult, 
-    output_retries=3,
-    system_prompt=(
-        "you are an expert in index extracting we'll provide the list of description with index and search description "
-        "and you have to findout the index of the description"
-        "index which is best match or complete match with the search description"
-        "also provide the date of the work done also if only date is provided remember current year is 2025, None if date is not provided"
-    )
+class FastResult(SupportResult):
+    confidence: float = Field(ge=0, le=1, description="confidence from 0 to 1 that the item id is the right match for the search description")
+
+MODEL_NAME = "groq:llama-3.3-70b-versatile"
+# Used when the primary is slow or failing; override the whole chain with LLM_MODELS
+FALLBACK_MODELS = ["groq:meta-llama/llama-4-scout-17b-16e-instruct"]
+# Fast tier of the cascade (see src/llm_cascade.py); override with LLM_FAST_MODELS, empty disables it.
+# Not part of the chain above: an escalated report should not hedge onto the model that gave up on it.
+FAST_MODELS = ["groq:llama-3.1-8b-instant"]
+
+SYSTEM_PROMPT = (
+    "you are an expert in item extracting we'll provide the list of description with item id and search description "
+    "and you have to findout the item id of the description"
+    "which is best match or complete match with the search description"
+    "also provide the date of the work done also if only date is provided remember current year is 2025, None if date is not provided"
+)
+
+FAST_SYSTEM_PROMPT = SYSTEM_PROMPT + (
+    " and how confident you are in the item id, from 0 to 1; give a low confidence when several descriptions"
+    " could match or none matches well"
 )
 
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "dpr_llm_prompt_tokens_total", "Estimated prompt tokens per part (static prefix or per-request suffix).", ("part",))
+
+_provider_chain = None
+_fast_chain = None
+_schedulers = {}
+_chain_lock = threading.Lock()
+_scheduler_lock = threading.Lock()
+
+
+def build_model(model_name: str):
+    """
+    The model for a "provider:model" name. Groq models get a provider on the
+    shared pooled HTTP client, so connections opened by a warm-up are reused;
+    other names are resolved by pydantic_ai itself.
+    """
+    provider_name, _, name = model_name.partition(":")
+    if provider_name != "groq":
+        return model_name
+    from pydantic_ai.models.groq import GroqModel
+    from pydantic_ai.providers.groq import GroqProvider
+
+    return GroqModel(name, provider=GroqProvider(http_client=get_http_client()))
+
+
+def build_agent(model_name: str):
+    """
+    Build the extraction agent for one model.
+
+    pydantic_ai and the Groq client are heavy to import and the provider
+    needs GROQ_API_KEY, so this only happens on first use.
+    """
+    from pydantic_ai import Agent, ModelRetry, RunContext
+
+    agent = Agent(build_model(model_name),
+        output_type=SupportResult, 
+        deps_type=SheetItems,
+        output_retries=3,
+        system_prompt=SYSTEM_PROMPT
+    )
+
+    @agent.output_validator
+    def check_item_id(ctx: RunContext[SheetItems], output: SupportResult) -> SupportResult:
+        # An ID that is not on the sheet being updated goes back to the model as a retry
+        if ctx.deps is not None:
+            try:
+                ctx.deps.row_for(output.item_id)
+            except KeyError as e:
+                raise ModelRetry(f"{e.args[0]} Answer with one of the item ids from the list.")
+        return output
+
+    logger.info(f"support agent created for model : {model_name}")
+    return agent
+
+
+def build_fast_agent(model_name: str):
+    """
+    Build the fast-tier agent for one model. It also rates its confidence and
+    does not retry unknown item IDs; those are escalated instead.
+    """
+    from pydantic_ai import Agent
+
+    agent = Agent(build_model(model_name),
+        output_type=FastResult,
+        output_retries=1,
+        system_prompt=FAST_SYSTEM_PROMPT
+    )
+    logger.info(f"fast agent created for model : {model_name}")
+    return agent
+
+
+def scheduler_for(model_name: str) -> LLMScheduler:
+    """One rate-limit scheduler per model, shared by every chain the model is in."""
+    with _scheduler_lock:
+        if model_name not in _schedulers:
+            _schedulers[model_name] = LLMScheduler.from_env(model_name)
+        return _schedulers[model_name]
+
+
+def _models_from_env(name: str, default):
+    configured = os.getenv(name)
+    if configured is None:
+        return list(default)
+    return [m.strip() for m in configured.split(",") if m.strip()]
+
+
+def get_provider_chain():
+    """
+    The ordered providers requests are hedged across, primary first.
+    Read from LLM_MODELS (comma separated) or MODEL_NAME + FALLBACK_MODELS.
+    """
+    global _provider_chain
+    if _provider_chain is None:
+        with _chain_lock:
+            if _provider_chain is None:
+                models = _models_from_env("LLM_MODELS", []) or [MODEL_NAME, *FALLBACK_MODELS]
+                _provider_chain = [Provider(model, build_agent, scheduler=scheduler_for(model)) for model in models]
+                logger.info(f"llm provider chain : {models}")
+    return _provider_chain
+
+
+def get_fast_chain():
+    """
+    The fast-tier providers, read from LLM_FAST_MODELS (comma separated) or
+    FAST_MODELS. An empty list turns the cascade off.
+    """
+    global _fast_chain
+    if _fast_chain is None:
+        with _chain_lock:
+            if _fast_chain is None:
+                models = _models_from_env("LLM_FAST_MODELS", FAST_MODELS)
+                _fast_chain = [Provider(model, build_fast_agent, scheduler=scheduler_for(model)) for model in models]
+                logger.info(f"llm fast tier : {models}")
+    return _fast_chain
+
+
+def get_support_agent():
+    """The primary model's agent."""
+    return get_provider_chain()[0].agent
+
+
+def warm_up():
+    """Build the agents ahead of the first request; errors are logged, not raised."""
+    for provider in [*get_fast_chain(), *get_provider_chain()]:
+        try:
+            provider.agent
+        except Exception as e:
+            logger.warning(f"could not warm up agent for {provider.model_name}: {str(e)}")
+
+
+async def warm_connections() -> bool:
+    """
+    Open a pooled connection to every provider endpoint of both tiers; builds
+    the agents if needed. Returns True when every connection was opened.
+    """
+    urls = set()
+    for provider in [*get_fast_chain(), *get_provider_chain()]:
+        url = getattr(provider.agent.model, "base_url", None)
+        if url:
+            urls.add(url)
+    return all(await asyncio.gather(*(open_connection(url) for url in urls)))
+
+
+def record_usage(usage, model: str = MODEL_NAME):
+    """Feed the token and retry counts of a finished run into the metrics registry."""
+    LLM_INPUT_TOKENS.inc(usage.request_tokens or 0, model=model)
+    LLM_OUTPUT_TOKENS.inc(usage.response_tokens or 0, model=model)
+    if usage.requests > 1:
+        LLM_RETRIES.inc(usage.requests - 1, model=model)
+
+
+async def get_llm_result(search_description, file_path: str = FILE_PATH, sheet_name: str = SHEET_NAME,
+                         priority: int = INTERACTIVE):
+    """
+    Extract the item, quantity and date of a report, on the fast tier when
+    it is confident enough and on the large models otherwise.
 
-async def get_llm_result(search_description):
-    prompt = prompt_builder(search_description) 
-    response = await support_agent.run(prompt)
+    Returns:
+        tuple: (row_index, updated_quantity, date, item_id), with the item ID
+            resolved to its row on `sheet_name`
+    """
+    with span("prompt_builder", sheet=sheet_name):
+        prefix, suffix = build_prompt(search_description, file_path, sheet_name)
+        sheet_items = get_item_catalog(file_path).for_sheet(sheet_name)
+    suffix_tokens = estimate_tokens(suffix)
+    with span("llm_call"):
+        response, provider, escalated = await cascade_run(
+            get_fast_chain(), get_provider_chain(), prefix.text + suffix, lambda item_id: item_id.strip() in sheet_items.rows,
+            priority, deps=sheet_items, prompt_tokens=prefix.tokens + suffix_tokens)
+    for attempt, attempt_provider in [*escalated, (response, provider)]:
+        usage = attempt.usage()
+        record_usage(usage, attempt_provider.model_name)
+        LLM_PROMPT_TOKENS.inc(prefix.tokens, part="prefix")
+        LLM_PROMPT_TOKENS.inc(suffix_tokens, part="suffix")
+        emit_event({"ts": time.time(), "event": "llm_usage", "model": attempt_provider.model_name,
+                    "sheet": sheet_name, "catalog": prefix.catalog_key, "prefix_tokens": prefix.tokens,
+                    "suffix_tokens": suffix_tokens, "request_tokens": usage.request_tokens,
+                    "response_tokens": usage.response_tokens, "requests": usage.requests,
+                    "confidence": getattr(attempt.output, "confidence", None),
+                    "used": attempt is response})
     logger.info(f"response is : {response}")
     logger.info(f"response output is : {response.output}")
-    return response.output.relvant_index, response.output.updated_quantity, response.output.date
+    output = response.output
+    return sheet_items.row_for(output.item_id), output.updated_quantity, output.date, output.item_id
 
 
 if __name__ == "__main__": 
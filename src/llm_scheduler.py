@@ -0,0 +1,286 @@
+"""
+Rate-limit-aware scheduler for LLM calls.
+
+Groq enforces requests-per-minute and tokens-per-minute limits and answers
+429 when they are exceeded. Each provider gets one scheduler that keeps it
+under those limits while pushing as much work through as it can:
+
+- two token buckets (requests and tokens) sized from the configured limits,
+  charged with an estimate of the prompt's tokens up front and settled with
+  the real usage afterwards
+- an AIMD concurrency limit: +1 slot per window of healthy calls, halved on
+  a 429, trimmed when latency climbs well above the observed baseline
+- 429s are retried with jittered exponential backoff that honours
+  `Retry-After` (or Groq's "try again in Xs" message), pausing every waiter
+- interactive work (desktop saves, phone reports) is always dispatched
+  before bulk imports
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+from utils.logger import get_logger
+from utils.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Completion tokens charged per call before the real usage is known.
+OUTPUT_TOKEN_ESTIMATE = 64
+
+LLM_RATE_LIMITED = REGISTRY.counter(
+    "dpr_llm_rate_limited_total", "429 responses received per model.", ("model",))
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "dpr_llm_queue_wait_seconds", "Time spent waiting for a rate-limit slot.", ("model", "priority"))
+LLM_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "dpr_llm_concurrency_limit", "Current adaptive concurrency limit per model.", ("model",))
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "dpr_llm_in_flight", "LLM calls currently running per model.", ("model",))
+
+_RETRY_IN_PATTERN = re.compile(r"try again in (?:(\d+)m)?(\d+(?:\.\d+)?)(ms|s)", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds the provider asked us to wait, from the Retry-After header of the
+    underlying HTTP error or the "Please try again in 1.5s" text Groq sends.
+    """
+    cause = error.__cause__ or error
+    response = getattr(cause, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+    match = _RETRY_IN_PATTERN.search(str(getattr(error, "body", "")) + str(cause))
+    if match:
+        minutes, value, unit = match.groups()
+        seconds = float(value) / 1000 if unit.lower() == "ms" else float(value)
+        return seconds + 60 * int(minutes or 0)
+    return None
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` per second."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.level = capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (0 when it can be right now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Give back (positive) or charge extra (negative) tokens after the fact."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(self, initial: float = 2, minimum: float = 1, maximum: float = 16,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.baseline: Optional[float] = None
+
+    def on_success(self, latency: float) -> None:
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            # Track the fast end of latency: drop quickly, rise slowly.
+            weight = 0.5 if latency < self.baseline else 0.05
+            self.baseline += (latency - self.baseline) * weight
+        if latency > self.baseline * self.latency_tolerance:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+
+class LLMScheduler:
+    """
+    Admission control for one provider. `run` waits for a slot, calls the
+    coroutine factory and retries 429s.
+
+    Usage:
+        scheduler = LLMScheduler.from_env("groq:llama-3.3-70b-versatile")
+        response = await scheduler.run(lambda: agent.run(prompt), tokens=estimate_tokens(prompt))
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 30, tokens_per_minute: float = 12000,
+                 max_concurrency: int = 8, max_retries: int = 4, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute, clock)
+        self.limiter = AIMDLimiter(initial=min(2, max_concurrency), maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._loop = None
+        self._changed: Optional[asyncio.Event] = None
+        LLM_CONCURRENCY_LIMIT.set(self.limiter.limit, model=name)
+
+    @classmethod
+    def from_env(cls, name: str) -> "LLMScheduler":
+        """Limits from LLM_RPM, LLM_TPM and LLM_MAX_CONCURRENCY (Groq free-tier defaults)."""
+        return cls(
+            name,
+            requests_per_minute=float(os.getenv("LLM_RPM", "30")),
+            tokens_per_minute=float(os.getenv("LLM_TPM", "12000")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        )
+
+    def _event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use on this event loop (the desktop app runs one loop per save).
+            self._loop = loop
+            self._changed = asyncio.Event()
+            self._waiting = []
+            self.in_flight = 0
+        return self._changed
+
+    def _notify(self) -> None:
+        event = self._event()
+        event.set()
+        self._changed = asyncio.Event()
+
+    def backoff(self, attempt: int, hint: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider's hint."""
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        if hint is not None:
+            delay = max(delay, hint + random.uniform(0, self.base_backoff / 2))
+        return delay
+
+    async def _acquire(self, tokens: int, priority: int) -> None:
+        self._event()
+        entry = (priority, next(self._sequence))
+        heapq.heappush(self._waiting, entry)
+        start = self.clock()
+        try:
+            while True:
+                delay = None
+                if self._waiting[0] == entry and self.in_flight < self.limiter.limit:
+                    delay = max(self.blocked_until - self.clock(), self.requests.delay_for(1),
+                                self.tokens.delay_for(tokens))
+                    if delay <= 0:
+                        heapq.heappop(self._waiting)
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        self.in_flight += 1
+                        LLM_IN_FLIGHT.set(self.in_flight, model=self.name)
+                        LLM_QUEUE_WAIT_SECONDS.observe(self.clock() - start, model=self.name,
+                                                       priority=PRIORITY_NAMES.get(priority, str(priority)))
+                        self._notify()
+                        return
+                event = self._changed
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._notify()
+            raise
+
+    @property
+    def saturated(self) -> bool:
+        """
+        Whether a new call would wait for rate-limit budget: paused after a 429,
+        or the request bucket cannot cover the calls already queued plus one.
+        (Waiting for a concurrency slot is short and does not count.)
+        """
+        return (self.blocked_until > self.clock()
+                or self.requests.delay_for(len(self._waiting) + 1) > 0)
+
+    def _release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        LLM_IN_FLIGHT.set(self.in_flight, model=self.name)
+        LLM_CONCURRENCY_LIMIT.set(self.limiter.limit, model=self.name)
+        self._notify()
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once the real token usage of a call is known."""
+        if actual:
+            self.tokens.refund(estimated - actual)
+
+    async def run(self, call: Callable[[], Awaitable], tokens: int, priority: int = INTERACTIVE):
+        attempt = 0
+        while True:
+            await self._acquire(tokens, priority)
+            start = self.clock()
+            try:
+                result = await call()
+            except BaseException as e:
+                if not isinstance(e, Exception) or not is_rate_limited(e):
+                    # includes cancellation by a hedge that was won elsewhere
+                    self._release()
+                    raise
+                LLM_RATE_LIMITED.inc(model=self.name)
+                self.limiter.on_overload()
+                hint = retry_after(e)
+                delay = self.backoff(attempt, hint)
+                # Everybody waits, not just this call: the whole quota is exhausted.
+                self.blocked_until = max(self.blocked_until, self.clock() + delay)
+                self._release()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"{self.name} rate limited, retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.limiter.on_success(self.clock() - start)
+            self._release()
+            return result
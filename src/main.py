@@ -1,13 +1,35 @@
 from src.sheet_data_fetch import get_date_column, update_sheet, put_logs_in_file
 from src.llm_result import get_llm_result
-from asyncio import run
+from src.llm_scheduler import INTERACTIVE
+from src.idempotency import mark_written
+from asyncio import run, to_thread, ensure_future, shield, CancelledError
+from typing import Optional
 from config.configuration import FILE_PATH
+from src.projects import Project, get_registry
 from utils.logger import get_logger
+from utils.metrics import span
+from utils.profiling import profiled
 import datetime
 
 logger = get_logger(__name__)
 
-async def updated_quantity_in_sheet(description: str, sheet_name: str, name: str = "User", location: str = "Home"):
+async def run_to_completion(awaitable):
+    """
+    Await `awaitable`, and if the caller is cancelled meanwhile, let it finish
+    before the cancellation propagates (a workbook write must not be left in
+    an unknown state).
+    """
+    task = ensure_future(awaitable)
+    try:
+        return await shield(task)
+    except CancelledError:
+        await task
+        raise
+
+@profiled("updated_quantity_in_sheet")
+async def updated_quantity_in_sheet(description: str, sheet_name: str, name: str = "User", location: str = "Home",
+                                    file_path: str = FILE_PATH, project: Optional[Project] = None,
+                                    priority: int = INTERACTIVE):
     """
     Update the quantity in the specified sheet based on the description.
     
@@ -16,42 +38,75 @@ async def updated_quantity_in_sheet(description: str, sheet_name: str, name: str
         sheet_name (str): The name of the sheet to update
         name (str, optional): Name of the person making the update
         location (str, optional): Location where the update is being made
+        file_path (str, optional): Workbook to update, defaults to the configured DPR.xlsx
+        project (Project, optional): Project to update; overrides file_path and supplies
+            the concurrency limit and write queue. Looked up by file_path when omitted.
+        priority (int, optional): LLM scheduling priority, INTERACTIVE or BULK
+
+    Returns:
+        dict: The cell that was updated (sheet_name, item_id, row, column, value, date),
+            which is also what duplicate submissions get back
     """
+    project = project or get_registry().for_path(file_path)
+    file_path = project.file_path
     try:
-        # Get the row and updated quantity from LLM
-        row_index, updated_quantity, date = await get_llm_result(description)
+        # Get the row and updated quantity from LLM, within the project's concurrency budget
+        async with project.limiter.slot(priority):
+            with span("get_llm_result", sheet=sheet_name):
+                row_index, updated_quantity, date, item_id = await get_llm_result(
+                    description, file_path, sheet_name, priority)
         
         # Get the column for today's date in the specified sheet
-        col_index = get_date_column(FILE_PATH, sheet_name, date)
+        with span("get_date_column", sheet=sheet_name):
+            col_index = get_date_column(file_path, sheet_name, date)
         
         if not col_index:
             raise ValueError(f"Could not find today's date in sheet: {sheet_name}")
             
         logger.info(f"Updating sheet: {sheet_name}, row: {row_index}, col: {col_index}, value: {updated_quantity}")
-        
-        # Update the sheet with the new quantity
-        update_sheet(
-            file_path=FILE_PATH,
-            sheet_name=sheet_name,
-            row_index=row_index,
-            column_index=col_index,
-            value=updated_quantity
-        )
-        
-        # Log the update with additional metadata
-        put_logs_in_file(
-            file_path=FILE_PATH,
-            sheet_name=sheet_name,
-            description=description,
-            row_index=row_index,
-            column_index=col_index,
-            value=updated_quantity,
-            name=name,
-            location=location
-        )
+        result = {
+            "sheet_name": sheet_name,
+            "item_id": item_id,
+            "row": row_index,
+            "column": col_index,
+            "value": updated_quantity,
+            "date": date.isoformat() if date else None,
+        }
+
+        def write_report():
+            # Update the sheet with the new quantity
+            with span("update_sheet", sheet=sheet_name):
+                update_sheet(
+                    file_path=file_path,
+                    sheet_name=sheet_name,
+                    row_index=row_index,
+                    column_index=col_index,
+                    value=updated_quantity
+                )
+            # From here on a retried submission must not add the quantity again
+            mark_written(result)
+
+            # Log the update with additional metadata
+            with span("put_logs_in_file", sheet=sheet_name):
+                put_logs_in_file(
+                    file_path=file_path,
+                    sheet_name=sheet_name,
+                    description=description,
+                    row_index=row_index,
+                    column_index=col_index,
+                    value=updated_quantity,
+                    name=name,
+                    location=location
+                )
+
+        # Writes to one workbook are queued behind the project's write lock and run
+        # in a worker thread, so LLM calls of other reports keep going meanwhile.
+        # Both saves finish before the lock is released, even if this task is cancelled.
+        async with project.write_lock:
+            await run_to_completion(to_thread(write_report))
         
         logger.info(f"Successfully updated sheet: {sheet_name}")
-        return True
+        return result
         
     except Exception as e:
         logger.error(f"Error updating sheet {sheet_name}: {str(e)}")
@@ -0,0 +1,305 @@
+"""
+Progress summaries for dashboards: totals per BOQ item and per day.
+
+Each monthly sheet keeps one "Achieved Qty." column per day (right after the
+date header in row 1) and one row per BOQ item. The achieved quantities are
+loaded once per workbook version into a NumPy array of shape (items, days);
+every summary is computed from that array with vectorized operations and
+cached under the same version, so polling dashboards only pay for a dict
+lookup until the workbook changes.
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import openpyxl
+
+from src.workbook_index import WorkbookIndex, get_workbook_index, on_index_built
+from utils.logger import get_logger
+from utils.metrics import CACHE_HITS, CACHE_MISSES, span
+
+logger = get_logger(__name__)
+
+BOQ_NO_COLUMN = 2
+UNIT_COLUMN = 5
+BOQ_QUANTITY_COLUMN = 6
+COMPLETED_BEFORE_COLUMN = 7
+PLANNED_MONTH_COLUMN = 9
+
+DEFAULT_WINDOW = 7
+MAX_CACHED_SUMMARIES = 256
+
+_grids: Dict[Tuple[str, str], "ProgressGrid"] = {}
+_summaries: "OrderedDict[tuple, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def to_number(value) -> float:
+    """Cell value as a float; blanks, '-' and other text count as 0."""
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").replace("₹", "").strip())
+    except ValueError:
+        return 0.0
+
+
+@dataclass(frozen=True)
+class ProgressGrid:
+    sheet_name: str
+    version: Tuple[int, int]
+    rows: Tuple[int, ...]
+    boq_numbers: Tuple[object, ...]
+    descriptions: Tuple[str, ...]
+    units: Tuple[object, ...]
+    dates: Tuple[datetime.date, ...]
+    # (items,) arrays from the fixed columns of the sheet
+    boq_quantity: np.ndarray
+    completed_before: np.ndarray
+    planned_month: np.ndarray
+    # (items, days) achieved quantity per item and day
+    quantities: np.ndarray
+
+    def day_range(self, start: Optional[datetime.date] = None,
+                  end: Optional[datetime.date] = None) -> slice:
+        """Columns of `quantities` covering start..end (inclusive); dates are sorted."""
+        dates = np.array([d.toordinal() for d in self.dates], dtype=np.int64)
+        lo = 0 if start is None else int(np.searchsorted(dates, start.toordinal(), side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, end.toordinal(), side="right"))
+        return slice(lo, max(lo, hi))
+
+
+def load_grid(file_path: str, sheet_name: str, index: Optional[WorkbookIndex] = None) -> ProgressGrid:
+    """
+    Read the achieved-quantity grid of one sheet in a single read-only pass.
+
+    Raises:
+        KeyError: If the sheet does not exist or has no date columns (LOGS)
+    """
+    index = index or get_workbook_index(file_path)
+    sheet = index.sheet(sheet_name)
+    if not sheet.date_columns:
+        # Same rule as the item catalog: sheets without daily columns hold no progress
+        raise KeyError(f"Worksheet {sheet_name} has no daily progress columns.")
+    dated = sorted(sheet.date_columns.items())
+    dates = tuple(date for date, _ in dated)
+    date_columns = np.array([column - 1 for _, column in dated], dtype=np.int64)
+    fixed_columns = np.array([BOQ_QUANTITY_COLUMN, COMPLETED_BEFORE_COLUMN, PLANNED_MONTH_COLUMN]) - 1
+    rows = tuple(row for row, _ in sheet.descriptions)
+    wanted = set(rows)
+
+    values = np.zeros((len(rows), len(dates)), dtype=np.float64)
+    fixed = np.zeros((len(rows), len(fixed_columns)), dtype=np.float64)
+    boq_numbers, units = [], []
+    if rows:
+        max_col = int(max(date_columns.max(initial=0), fixed_columns.max())) + 1
+        with span("load_progress_grid", sheet=sheet_name):
+            wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                ws = wb[sheet_name]
+                i = 0
+                for row_num, cells in enumerate(
+                        ws.iter_rows(min_row=rows[0], max_row=rows[-1], max_col=max_col, values_only=True),
+                        start=rows[0]):
+                    if row_num not in wanted:
+                        continue
+                    # Short rows (trailing empty cells) are padded so fancy indexing works.
+                    cells = np.array(list(cells) + [None] * (max_col - len(cells)), dtype=object)
+                    values[i] = [to_number(v) for v in cells[date_columns]]
+                    fixed[i] = [to_number(v) for v in cells[fixed_columns]]
+                    boq_numbers.append(cells[BOQ_NO_COLUMN - 1])
+                    units.append(cells[UNIT_COLUMN - 1])
+                    i += 1
+            finally:
+                wb.close()
+
+    return ProgressGrid(
+        sheet_name=sheet.name,
+        version=index.version,
+        rows=rows,
+        boq_numbers=tuple(boq_numbers),
+        descriptions=tuple(str(value) for _, value in sheet.descriptions),
+        units=tuple(units),
+        dates=dates,
+        boq_quantity=fixed[:, 0],
+        completed_before=fixed[:, 1],
+        planned_month=fixed[:, 2],
+        quantities=values,
+    )
+
+
+def get_grid(file_path: str, sheet_name: str) -> ProgressGrid:
+    """The grid of the workbook's current version, loaded on first use."""
+    index = get_workbook_index(file_path)
+    key = (os.path.abspath(file_path), sheet_name)
+    grid = _grids.get(key)
+    if grid is not None and grid.version == index.version:
+        CACHE_HITS.inc(cache="progress_grid")
+        return grid
+    CACHE_MISSES.inc(cache="progress_grid")
+    grid = load_grid(file_path, sheet_name, index)
+    with _lock:
+        current = _grids.get(key)
+        if current is None or current.version <= grid.version:
+            _grids[key] = grid
+    return grid
+
+
+@on_index_built
+def _drop_stale(index: WorkbookIndex) -> None:
+    """Free grids and summaries of older versions once a workbook has changed."""
+    path = os.path.abspath(index.file_path)
+    with _lock:
+        for key in [k for k, grid in _grids.items() if k[0] == path and grid.version < index.version]:
+            del _grids[key]
+        for key in [k for k in _summaries if k[0] == path and k[1] < index.version]:
+            del _summaries[key]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over the last `window` entries along the last axis (shorter at the start)."""
+    window = max(1, window)
+    cumulative = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(cumulative)
+    if window < values.shape[-1]:
+        shifted[..., window:] = cumulative[..., :-window]
+    counts = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return (cumulative - shifted) / counts
+
+
+def _elapsed_days(dates: Tuple[datetime.date, ...], today: datetime.date) -> int:
+    return sum(1 for date in dates if date <= today)
+
+
+def _clean(array: np.ndarray) -> List[Optional[float]]:
+    """JSON-friendly list: rounded, NaN/inf as None."""
+    rounded = np.round(array.astype(np.float64), 3)
+    return [float(v) if np.isfinite(v) else None for v in rounded]
+
+
+def _round(value) -> Optional[float]:
+    return _clean(np.array([value]))[0]
+
+
+def _cached(key: tuple, build) -> dict:
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is not None:
+            _summaries.move_to_end(key)
+    if summary is not None:
+        CACHE_HITS.inc(cache="progress")
+        return summary
+    CACHE_MISSES.inc(cache="progress")
+    summary = build()
+    with _lock:
+        _summaries[key] = summary
+        while len(_summaries) > MAX_CACHED_SUMMARIES:
+            _summaries.popitem(last=False)
+    return summary
+
+
+def item_summary(file_path: str, sheet_name: str, start: Optional[datetime.date] = None,
+                 end: Optional[datetime.date] = None, window: int = DEFAULT_WINDOW,
+                 today: Optional[datetime.date] = None) -> dict:
+    """
+    Per-item progress for the days start..end (the whole sheet by default).
+
+    Returns:
+        dict: `items` with achieved quantity in the range, cumulative completion
+            and percentage of the BOQ quantity, share of the month's plan,
+            average daily burn and the trailing `window`-day average, plus totals
+    """
+    today = today or datetime.date.today()
+    grid = get_grid(file_path, sheet_name)
+    key = (os.path.abspath(file_path), grid.version, "items", sheet_name, start, end, window, today)
+
+    def build():
+        days = grid.day_range(start, end)
+        dates = grid.dates[days]
+        achieved = grid.quantities[:, days]
+        elapsed = grid.day_range(start, min(end or today, today))
+        elapsed_days = max(1, elapsed.stop - elapsed.start)
+
+        in_range = achieved.sum(axis=1)
+        month_to_date = grid.quantities[:, grid.day_range(None, end)].sum(axis=1)
+        completed = grid.completed_before + month_to_date
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(grid.boq_quantity > 0, completed / grid.boq_quantity * 100, np.nan)
+            of_plan = np.where(grid.planned_month > 0, month_to_date / grid.planned_month * 100, np.nan)
+        burn = grid.quantities[:, elapsed].sum(axis=1) / elapsed_days
+        recent_end = elapsed.stop
+        recent = grid.quantities[:, max(elapsed.start, recent_end - window):recent_end]
+        recent_avg = recent.mean(axis=1) if recent.shape[1] else np.zeros(len(grid.rows))
+
+        columns = {
+            "achieved": _clean(in_range),
+            "completed_to_date": _clean(completed),
+            "percent_complete": _clean(percent),
+            "percent_of_monthly_plan": _clean(of_plan),
+            "daily_burn": _clean(burn),
+            "recent_daily_average": _clean(recent_avg),
+            "boq_quantity": _clean(grid.boq_quantity),
+            "planned_for_month": _clean(grid.planned_month),
+        }
+        items = [{
+            "row": row,
+            "boq_no": grid.boq_numbers[i],
+            "description": grid.descriptions[i],
+            "unit": grid.units[i],
+            **{name: values[i] for name, values in columns.items()},
+        } for i, row in enumerate(grid.rows)]
+        return {
+            "sheet_name": grid.sheet_name,
+            "start": dates[0].isoformat() if dates else None,
+            "end": dates[-1].isoformat() if dates else None,
+            "window": window,
+            "days_elapsed": _elapsed_days(dates, today),
+            "total_achieved": _round(in_range.sum()),
+            "items": items,
+        }
+
+    return _cached(key, build)
+
+
+def daily_summary(file_path: str, sheet_name: str, start: Optional[datetime.date] = None,
+                  end: Optional[datetime.date] = None, window: int = DEFAULT_WINDOW,
+                  row: Optional[int] = None) -> dict:
+    """
+    Per-day totals for start..end with a trailing `window`-day rolling
+    average, for the whole sheet or a single item row.
+
+    Raises:
+        KeyError: If `row` is not an item row of the sheet
+    """
+    grid = get_grid(file_path, sheet_name)
+    key = (os.path.abspath(file_path), grid.version, "daily", sheet_name, start, end, window, row)
+
+    def build():
+        days = grid.day_range(start, end)
+        if row is None:
+            series = grid.quantities.sum(axis=0)
+        else:
+            if row not in grid.rows:
+                raise KeyError(f"Row {row} is not an item of {sheet_name}.")
+            series = grid.quantities[grid.rows.index(row)]
+        # Roll over the whole month so the first days of a range still see their history.
+        rolling = rolling_mean(series, window)[days]
+        totals = series[days]
+        cumulative = np.cumsum(series)[days]
+        return {
+            "sheet_name": grid.sheet_name,
+            "row": row,
+            "window": window,
+            "total": _round(totals.sum()),
+            "days": [{"date": date.isoformat(), "total": total, "rolling_average": avg, "cumulative": cum}
+                     for date, total, avg, cum in zip(grid.dates[days], _clean(totals),
+                                                       _clean(rolling), _clean(cumulative))],
+        }
+
+    return _cached(key, build)
@@ -0,0 +1,207 @@
+"""
+Project registry: one server process, many DPR workbooks.
+
+Each project maps an ID to a workbook and owns its own resource budget:
+a priority-aware limiter that bounds concurrent LLM work (interactive reports
+get the next free slot ahead of queued bulk work) and a write lock that queues
+workbook writes, so a busy site cannot starve the others and writes to one
+workbook never interleave (projects that point at the same workbook share
+its write lock). Workbook indexes are cached per file, so every
+project also gets its own caches.
+
+Projects are read from the JSON file named by `DPR_PROJECTS_FILE`
+(default: `<CONFIG_DIR>/projects.json`):
+
+    {
+        "site-a": {"file_path": "/data/site-a/DPR.xlsx", "max_concurrency": 4},
+        "site-b": {"file_path": "/data/site-b/DPR.xlsx"}
+    }
+
+A `default` project pointing at `EXCEL_FILE_PATH` (or the bundled DPR.xlsx)
+always exists unless the file defines one itself. A relative
+`EXCEL_FILE_PATH` is taken to be inside `excel_files/`.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config.configuration import EXCEL_DIR, FILE_PATH, PROJECTS_FILE, DEFAULT_PROJECT_CONCURRENCY
+from src.llm_scheduler import INTERACTIVE
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PROJECT_ID = "default"
+
+
+class UnknownProjectError(KeyError):
+    """Raised when a request names a project that is not registered."""
+
+
+class PriorityLimiter:
+    """
+    Semaphore that hands a freed slot to the most urgent waiter (lowest
+    priority value, FIFO within a priority), so an interactive report does
+    not queue behind every bulk item of an import.
+
+    Usage:
+        async with project.limiter.slot(priority):
+            ...
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.in_use = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        if self.in_use < self.slots and not self._waiters:
+            self.in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # The slot goes straight to the waiter; in_use stays the same.
+                future.set_result(None)
+                return
+        self.in_use = max(0, self.in_use - 1)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@dataclass
+class Project:
+    project_id: str
+    file_path: str
+    max_concurrency: int = DEFAULT_PROJECT_CONCURRENCY
+    limiter: PriorityLimiter = field(init=False, repr=False)
+    write_lock: asyncio.Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.file_path = os.path.abspath(os.path.expanduser(self.file_path))
+        self.limiter = PriorityLimiter(self.max_concurrency)
+        self.write_lock = asyncio.Lock()
+
+    def to_dict(self) -> dict:
+        return {"project_id": self.project_id, "file_path": self.file_path,
+                "max_concurrency": self.max_concurrency}
+
+
+class ProjectRegistry:
+    """Lookup table of projects, plus ad-hoc projects for workbooks addressed by path."""
+
+    def __init__(self, projects: Optional[List[Project]] = None):
+        self._projects: Dict[str, Project] = {}
+        self._by_path: Dict[str, Project] = {}
+        self._lock = threading.Lock()
+        for project in projects or []:
+            self.register(project)
+
+    def register(self, project: Project) -> Project:
+        """
+        Add `project`. Projects on the same workbook share its write lock, so
+        their saves are queued behind each other like those of one project.
+        """
+        with self._lock:
+            owner = self._by_path.setdefault(project.file_path, project)
+            if owner is not project:
+                project.write_lock = owner.write_lock
+                logger.info(f"project {project.project_id} shares {project.file_path} with {owner.project_id}")
+            self._projects[project.project_id] = project
+        return project
+
+    def get(self, project_id: Optional[str] = None) -> Project:
+        """Return the project for `project_id`, or the default project when it is empty."""
+        project_id = project_id or DEFAULT_PROJECT_ID
+        try:
+            return self._projects[project_id]
+        except KeyError:
+            raise UnknownProjectError(f"Unknown project: {project_id}") from None
+
+    def for_path(self, file_path: str) -> Project:
+        """
+        Return the project that owns `file_path`. Callers that only know a path
+        (the desktop app, scripts) still get the per-workbook write queue.
+        """
+        path = os.path.abspath(os.path.expanduser(file_path))
+        with self._lock:
+            project = self._by_path.get(path)
+            if project is None:
+                project = Project(project_id=path, file_path=path)
+                self._by_path[path] = project
+        return project
+
+    def projects(self) -> List[Project]:
+        return list(self._projects.values())
+
+
+def default_file_path() -> str:
+    """The default project's workbook: EXCEL_FILE_PATH, relative to excel_files/, or the bundled DPR.xlsx."""
+    path = os.getenv("EXCEL_FILE_PATH")
+    if not path:
+        return FILE_PATH
+    # Independent of the directory the server was started from
+    return os.path.join(EXCEL_DIR, os.path.expanduser(path))
+
+
+def load_projects(projects_file: Optional[str] = None) -> ProjectRegistry:
+    """Build the registry from the projects file and the environment."""
+    projects_file = projects_file or os.getenv("DPR_PROJECTS_FILE") or PROJECTS_FILE
+    projects = []
+    if projects_file and os.path.exists(projects_file):
+        with open(projects_file, encoding="utf-8") as fh:
+            config = json.load(fh)
+        for project_id, options in config.items():
+            projects.append(Project(
+                project_id=project_id,
+                file_path=options["file_path"],
+                max_concurrency=int(options.get("max_concurrency", DEFAULT_PROJECT_CONCURRENCY)),
+            ))
+        logger.info(f"loaded {len(projects)} projects from {projects_file}")
+
+    if not any(project.project_id == DEFAULT_PROJECT_ID for project in projects):
+        projects.append(Project(project_id=DEFAULT_PROJECT_ID, file_path=default_file_path()))
+    return ProjectRegistry(projects)
+
+
+_registry: Optional[ProjectRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProjectRegistry:
+    """The process-wide registry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_projects()
+    return _registry
+
+
+def set_registry(registry: ProjectRegistry) -> None:
+    global _registry
+    _registry = registry
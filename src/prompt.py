@@ -1,31 +1,102 @@
+"""
+Extraction prompt, split into a static prefix and a per-request suffix.
+
+The prefix holds the instructions and the item list of the workbook's
+catalog. It is byte-for-byte identical for every report against the same
+catalog, so providers with prompt/prefix caching (and local models with a KV
+cache) can reuse it. It is rendered and token-counted once per catalog key,
+ahead of time when a workbook index is built. The suffix is just the search
+description.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
 from config.configuration import FILE_PATH, SHEET_NAME
-from  src.sheet_data_fetch import get_descriptions_with_index 
+from src.item_catalog import ItemCatalog, catalog_for_index, get_item_catalog
+from src.llm_scheduler import estimate_tokens
+from src.workbook_index import WorkbookIndex, on_index_built
 from utils.logger import get_logger
+from utils.metrics import CACHE_HITS, CACHE_MISSES
 logger = get_logger(__name__)
 
-def prompt_builder(search_description:str,path:str=FILE_PATH, sheet_name:str=SHEET_NAME):
-    description_list = get_descriptions_with_index(path,sheet_name)
+PROMPT_INSTRUCTIONS = """the search description is the normal query of what work has been done, we need to extract the quantity of work done
+in result provide the 2 thing one is the best fit search description's item id and
+second is the values in float which is quantity of work done or updated quantity of work done
+quantity should be described in ( kg, cubic, mtr, cubic meter, cubic feet, cubic yards, etc.)
+
+here is description list with it's item id :
+"""
+
+PROMPT_LIST_END = """
+
+find the description from the list that is the best match or exact match with the search description below
+"""
+
+_prefixes: Dict[str, "PromptPrefix"] = {}
+# workbook path -> catalog key of its latest prefix
+_current: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    catalog_key: str
+    text: str
+    tokens: int
+
 
-    PROMPT = f"""
-    here is description list with it's index : 
-    {description_list}
-    
-    and you have to find that below serach descrittion is having excat match with any description from the list
-    search description : {search_description}
+def get_prompt_prefix(catalog: ItemCatalog) -> PromptPrefix:
+    """The static part of the prompt for a catalog, rendered and counted once per catalog key."""
+    prefix = _prefixes.get(catalog.key)
+    if prefix is not None:
+        CACHE_HITS.inc(cache="prompt_prefix")
+    else:
+        CACHE_MISSES.inc(cache="prompt_prefix")
+        text = PROMPT_INSTRUCTIONS + catalog.render() + PROMPT_LIST_END
+        prefix = PromptPrefix(catalog_key=catalog.key, text=text, tokens=estimate_tokens(text))
+        logger.info(f"prompt prefix for catalog {catalog.key}: ~{prefix.tokens} tokens")
+    path = os.path.abspath(catalog.file_path)
+    with _lock:
+        _prefixes[catalog.key] = prefix
+        old_key = _current.get(path)
+        _current[path] = catalog.key
+        if old_key is not None and old_key != catalog.key and old_key not in _current.values():
+            # The workbook's items changed; the old prefix is not needed anymore
+            _prefixes.pop(old_key, None)
+    return prefix
 
-    proivded search descriptino is's the norma query that what thing has done we need to extract the quantity of work done
-    in result provide the 2 thing one is the best fit search description's index and 
-    second is the values in float which is quantity of work done or updated quantity of work don
-    quantyty should be described in ( kg, cubic, mtr, cubic meter, cubic feet, cubic yards, etc.)"""
 
-    logger.info(f"prompt is created : {PROMPT}")
-    return PROMPT
+def prompt_suffix(search_description: str) -> str:
+    return f"search description : {search_description}"
+
+
+@on_index_built
+def _prerender_prefix(index: WorkbookIndex) -> None:
+    """Have the prefix ready before the first report against a new workbook version."""
+    get_prompt_prefix(catalog_for_index(index))
+
+
+def build_prompt(search_description: str, path: str = FILE_PATH,
+                 sheet_name: str = SHEET_NAME) -> Tuple[PromptPrefix, str]:
+    """
+    Returns:
+        tuple: (prefix, suffix); the prompt sent to the model is prefix.text + suffix
+
+    Raises:
+        KeyError: If the sheet does not exist (before any LLM call is made)
+    """
+    catalog = get_item_catalog(path)
+    catalog.for_sheet(sheet_name)
+    return get_prompt_prefix(catalog), prompt_suffix(search_description)
+
+
+def prompt_builder(search_description:str,path:str=FILE_PATH, sheet_name:str=SHEET_NAME):
+    prefix, suffix = build_prompt(search_description, path, sheet_name)
+    return prefix.text + suffix
 
 
 if __name__ == "__main__":
     prompt = prompt_builder("Excavation for foundation of all type of soil 1.5 mt to 3.0 mt depth")
     print(prompt)
-
-    
-    
-       
\ No newline at end of file
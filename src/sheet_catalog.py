@@ -0,0 +1,71 @@
+"""
+Sheet catalog for a workbook: sheet names with per-sheet metadata.
+
+The catalog is versioned by the (mtime_ns, size) pair of the file, so the
+workbook is only opened again after it has actually changed on disk.
+"""
+import datetime
+import email.utils
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+FIRST_DESCRIPTION_ROW = 5
+DESCRIPTION_COLUMN = 3
+
+
+@dataclass(frozen=True)
+class SheetInfo:
+    name: str
+    row_count: int
+    first_date: Optional[datetime.date]
+    last_date: Optional[datetime.date]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "row_count": self.row_count,
+            "first_date": self.first_date.isoformat() if self.first_date else None,
+            "last_date": self.last_date.isoformat() if self.last_date else None,
+        }
+
+
+@dataclass(frozen=True)
+class SheetCatalog:
+    file_path: str
+    version: Tuple[int, int]
+    sheets: Tuple[SheetInfo, ...]
+
+    @property
+    def sheet_names(self):
+        return [sheet.name for sheet in self.sheets]
+
+    @property
+    def version_tag(self) -> str:
+        mtime_ns, size = self.version
+        return f"{size:x}-{mtime_ns:x}"
+
+    @property
+    def modified_at(self) -> float:
+        return self.version[0] / 1e9
+
+    @property
+    def last_modified(self) -> str:
+        """HTTP-date of the workbook's modification time, for the Last-Modified header"""
+        return email.utils.formatdate(self.modified_at, usegmt=True)
+
+
+def workbook_version(file_path: str) -> Tuple[int, int]:
+    """(mtime_ns, size) of the workbook; changes whenever the file is saved"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_sheet_catalog(file_path: str) -> SheetCatalog:
+    """
+    Return the catalog for the current version of the workbook. It is derived
+    from the cached workbook index, so it is only rebuilt after the file changes.
+    """
+    from src.workbook_index import get_workbook_index
+
+    return get_workbook_index(file_path).catalog
@@ -1,7 +1,9 @@
 import openpyxl
 from openpyxl.utils import get_column_letter
 import datetime
+import os
 from typing import List, Optional
+from src.workbook_index import get_workbook_index
 from utils.logger import get_logger
 logger = get_logger(__name__)
 
@@ -38,46 +40,41 @@ def get_descriptions_with_index(file_path, sheet_name="July.25"):
     """
     Extract Description column (C) data with row indices.
     Returns string format: "[(row_index, description), (row_index, description), ...]"
+
+    Served from the cached workbook index, see src.workbook_index.
     """
-    # Load the workbook
     logger.info(f"getting descriptions from workbook from path : {file_path} and sheet name is : {sheet_name}")
-    wb = openpyxl.load_workbook(file_path)
-    ws = wb[sheet_name]
-    
-    # Create list of tuples (row_index, description)
-    descriptions = []
-    
-    # Start from row 2 (skip header) and go to the last row
-    for row_num in range(5, ws.max_row + 1):
-        cell_value = ws[f"C{row_num}"].value
-        
-        # Only include non-empty values
-        if cell_value is not None and str(cell_value).strip() != "":
-            descriptions.append((row_num, cell_value))
-    
-    return str(descriptions)
+    sheet = get_workbook_index(file_path).sheet(sheet_name)
+    return str(list(sheet.descriptions))
 
 def get_date_column(file_path, sheet_name="July.25", date: datetime.date = None):
     """
-    find the column containing today's date in the first row.
+    find the column containing today's date (or the given date) in the first row.
+    Returns the column just after the date header, where the achieved quantity goes.
+
+    Served from the cached workbook index, see src.workbook_index.
     """
     logger.info(f"getting date column from workbook from path : {file_path} and sheet name is : {sheet_name}")
-    wb = openpyxl.load_workbook(file_path)
-    ws = wb[sheet_name]
-    
-    for cell in ws[1]:
-        if isinstance(cell.value, datetime.datetime):
-            if date is None:
-                if cell.value.date() == datetime.date.today():
-                    logger.info(f"date column is : {cell.column} and col name is : {get_column_letter(cell.column)}")
-                    return cell.column+1
-            else:
-                if cell.value.date() == date:
-                    logger.info(f"date column is : {cell.column} and col name is : {get_column_letter(cell.column)}")
-                    return cell.column+1
-    
-    logger.info("date column not found")
-    return None
+    column = get_workbook_index(file_path).sheet(sheet_name).date_column(date)
+    if column is None:
+        logger.info("date column not found")
+        return None
+
+    logger.info(f"date column is : {column - 1} and col name is : {get_column_letter(column - 1)}")
+    return column
+
+def save_workbook(wb, file_path: str) -> None:
+    """
+    Save to a temporary file next to the workbook and swap it in, so readers
+    (index rebuilds, concurrent reports) never open a half-written file.
+    """
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        wb.save(temp_path)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 def put_logs_in_file(file_path: str, sheet_name="LOGS", description=None, 
                    row_index=None, column_index=None, value: float = None,
@@ -124,7 +121,7 @@ def put_logs_in_file(file_path: str, sheet_name="LOGS", description=None,
     ws.cell(row=next_row, column=7, value=column_index)
     ws.cell(row=next_row, column=8, value=value)
 
-    wb.save(file_path)
+    save_workbook(wb, file_path)
     logger.info(f"log row {next_row} written successfully")
 
 def update_sheet(file_path: str = "/Users/devrajsinhgohil/Desktop/DPR/excel_files/DPR.xlsx", 
@@ -177,7 +174,7 @@ def update_sheet(file_path: str = "/Users/devrajsinhgohil/Desktop/DPR/excel_file
         cell.value = new_value
         
         # Save the workbook
-        wb.save(file_path)
+        save_workbook(wb, file_path)
         logger.info(f"Successfully updated cell {row_index},{column_index} with value: {new_value} (previous: {current_value}, added: {value})")
         
     except Exception as e:
@@ -0,0 +1,134 @@
+"""
+Speculative warm-up of the sheet the next report is going to target.
+
+Picking a sheet in the desktop app, or a phone calling /get_credentials,
+tells us where the next report goes before it is recorded. Warming that sheet
+in the background means the first report finds everything steady-state
+reports find:
+
+- the workbook index (parse, descriptions, date columns) built
+- the item catalog and its prompt prefix rendered
+- today's date column resolved
+- the LLM agents built and a pooled connection to the provider open
+
+Callers check `is_warm` first, so clients polling /get_credentials only
+trigger a warm-up when the workbook changed, the day rolled over, or the
+provider connection is due for a refresh (every CONNECTION_REFRESH_SECONDS
+after the last successful one).
+"""
+import asyncio
+import datetime
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config.configuration import LLM_KEEPALIVE_SECONDS
+from src.item_catalog import catalog_for_index
+from src.llm_result import warm_connections, warm_up
+from src.prompt import get_prompt_prefix
+from src.workbook_index import WorkbookIndex, get_workbook_index
+from utils.logger import get_logger
+from utils.metrics import REGISTRY, span
+
+logger = get_logger(__name__)
+
+WARMUPS = REGISTRY.counter(
+    "dpr_warmups_total", "Background warm-ups per trigger and result.", ("trigger", "result"))
+
+# Well inside the keep-alive window, so the pooled connection does not expire in between
+CONNECTION_REFRESH_SECONDS = LLM_KEEPALIVE_SECONDS / 2
+
+# Running warm-ups per (workbook, sheet); also keeps the tasks referenced
+_inflight: Dict[tuple, asyncio.Future] = {}
+# (workbook, sheet) -> (workbook version, date) of its last successful warm-up
+_warmed: Dict[tuple, Tuple[Tuple[int, int], datetime.date]] = {}
+_connected_at: Optional[float] = None
+
+
+def _connection_fresh() -> bool:
+    return _connected_at is not None and time.monotonic() - _connected_at < CONNECTION_REFRESH_SECONDS
+
+
+def is_warm(file_path: str, sheet_name: Optional[str], version: Tuple[int, int]) -> bool:
+    """Whether `sheet_name` (None: today's sheets) was warmed for this workbook version today."""
+    warmed = _warmed.get((os.path.abspath(file_path), sheet_name))
+    return warmed == (version, datetime.date.today()) and _connection_fresh()
+
+
+def warm_sheet(file_path: str, sheet_name: str) -> Optional[int]:
+    """
+    Build (or validate) the index, item catalog and prompt prefix for a sheet.
+
+    Returns:
+        int: The column for today's achieved quantity, None if the sheet has no column for today
+
+    Raises:
+        KeyError: If the sheet does not exist or takes no daily updates
+    """
+    with span("warm_sheet", sheet=sheet_name):
+        index = get_workbook_index(file_path)
+        sheet = index.sheet(sheet_name)
+        catalog = catalog_for_index(index)
+        catalog.for_sheet(sheet_name)
+        get_prompt_prefix(catalog)
+        return sheet.date_column()
+
+
+def sheets_for_today(index: WorkbookIndex) -> List[str]:
+    """Sheets with a column for today, the likely target when no sheet was picked."""
+    return [name for name, sheet in index.sheets.items() if sheet.date_column() is not None]
+
+
+async def warm_llm_connection() -> bool:
+    """Build the agents and open the provider connections, unless that was done recently."""
+    global _connected_at
+    if _connection_fresh():
+        return True
+    # Building the agents imports pydantic_ai and the provider SDK, which blocks.
+    await asyncio.to_thread(warm_up)
+    if not await warm_connections():
+        return False
+    _connected_at = time.monotonic()
+    return True
+
+
+async def prefetch(file_path: str, sheet_name: Optional[str] = None, trigger: str = "api") -> None:
+    """
+    Warm a sheet, or every sheet with a column for today, and the LLM
+    connection. Errors are logged, never raised.
+    """
+    try:
+        today = datetime.date.today()
+        index = await asyncio.to_thread(get_workbook_index, file_path)
+        sheets = [sheet_name] if sheet_name else sheets_for_today(index)
+        for name in sheets:
+            column = await asyncio.to_thread(warm_sheet, file_path, name)
+            if column is None:
+                logger.info(f"warm-up: {name} has no column for today")
+        connected = await warm_llm_connection()
+    except Exception as e:
+        WARMUPS.inc(trigger=trigger, result="error")
+        logger.warning(f"warm-up of {sheet_name or 'today'} in {file_path} failed: {str(e)}")
+        return
+    path = os.path.abspath(file_path)
+    for name in {sheet_name, *sheets}:
+        _warmed[(path, name)] = (index.version, today)
+    WARMUPS.inc(trigger=trigger, result="ok" if connected else "no_connection")
+    logger.info(f"warmed up {sheets} of {file_path} ({trigger})")
+
+
+def schedule_prefetch(file_path: str, sheet_name: Optional[str] = None, trigger: str = "api") -> asyncio.Future:
+    """Start `prefetch` in the background on the running loop, unless the same warm-up is still running."""
+    key = (os.path.abspath(file_path), sheet_name)
+    task = _inflight.get(key)
+    if task is not None and not task.done():
+        return task
+    task = asyncio.ensure_future(prefetch(file_path, sheet_name, trigger))
+    _inflight[key] = task
+
+    def forget(done):
+        if _inflight.get(key) is done:
+            del _inflight[key]
+
+    task.add_done_callback(forget)
+    return task
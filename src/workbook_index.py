@@ -0,0 +1,151 @@
+"""
+In-memory index of a workbook: descriptions, date columns and the sheet catalog.
+
+The index is built in one read-only pass and cached per workbook. Without a
+watcher the cache is validated with a `stat` on every lookup; once
+`src.workbook_watcher` watches the file, lookups return the current index
+straight away and the watcher swaps in a rebuilt one after changes.
+"""
+import datetime
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import openpyxl
+
+from src.sheet_catalog import (SheetCatalog, SheetInfo, workbook_version,
+                               FIRST_DESCRIPTION_ROW, DESCRIPTION_COLUMN)
+from utils.logger import get_logger
+from utils.metrics import CACHE_HITS, CACHE_MISSES, span
+
+logger = get_logger(__name__)
+
+_indexes: Dict[str, "WorkbookIndex"] = {}
+_watched = set()
+_lock = threading.Lock()
+_build_hooks: List[Callable[["WorkbookIndex"], None]] = []
+
+
+@dataclass(frozen=True)
+class SheetIndex:
+    name: str
+    descriptions: Tuple[Tuple[int, object], ...]
+    # date -> column holding the achieved quantity for that date (header column + 1)
+    date_columns: Dict[datetime.date, int] = field(default_factory=dict)
+
+    def date_column(self, date: Optional[datetime.date] = None) -> Optional[int]:
+        return self.date_columns.get(date or datetime.date.today())
+
+    def info(self) -> SheetInfo:
+        dates = list(self.date_columns)
+        return SheetInfo(
+            name=self.name,
+            row_count=len(self.descriptions),
+            first_date=min(dates) if dates else None,
+            last_date=max(dates) if dates else None,
+        )
+
+
+@dataclass(frozen=True)
+class WorkbookIndex:
+    file_path: str
+    version: Tuple[int, int]
+    sheets: Dict[str, SheetIndex]
+    catalog: SheetCatalog
+
+    def sheet(self, sheet_name: str) -> SheetIndex:
+        try:
+            return self.sheets[sheet_name]
+        except KeyError:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.") from None
+
+
+def _index_sheet(ws) -> SheetIndex:
+    date_columns = {}
+    for row in ws.iter_rows(min_row=1, max_row=1):
+        for cell in row:
+            if isinstance(cell.value, datetime.datetime):
+                date_columns.setdefault(cell.value.date(), cell.column + 1)
+
+    descriptions = []
+    for row_num, (value,) in enumerate(
+            ws.iter_rows(min_row=FIRST_DESCRIPTION_ROW, min_col=DESCRIPTION_COLUMN,
+                         max_col=DESCRIPTION_COLUMN, values_only=True),
+            start=FIRST_DESCRIPTION_ROW):
+        if value is not None and str(value).strip() != "":
+            descriptions.append((row_num, value))
+
+    return SheetIndex(name=ws.title.strip(), descriptions=tuple(descriptions), date_columns=date_columns)
+
+
+def build_workbook_index(file_path: str) -> WorkbookIndex:
+    """
+    Read descriptions and date headers of every sheet in one read-only pass.
+
+    Raises:
+        FileNotFoundError: If the specified file doesn't exist
+    """
+    version = workbook_version(file_path)
+    with span("build_workbook_index"):
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            sheets = {}
+            for name in wb.sheetnames:
+                if name.strip():
+                    sheet = _index_sheet(wb[name])
+                    sheets[sheet.name] = sheet
+        finally:
+            wb.close()
+    catalog = SheetCatalog(file_path=file_path, version=version,
+                           sheets=tuple(sheet.info() for sheet in sheets.values()))
+    logger.info(f"indexed {len(sheets)} sheets of {file_path} at version {catalog.version_tag}")
+    return WorkbookIndex(file_path=file_path, version=version, sheets=sheets, catalog=catalog)
+
+
+def on_index_built(callback: Callable[[WorkbookIndex], None]) -> Callable[[WorkbookIndex], None]:
+    """
+    Register a callback that runs after a new index is installed, e.g. to
+    precompute derived data. Callbacks run on the thread that built the index.
+    """
+    _build_hooks.append(callback)
+    return callback
+
+
+def install_index(index: WorkbookIndex) -> None:
+    """Atomically replace the cached index of a workbook, unless a newer one is already there."""
+    key = os.path.abspath(index.file_path)
+    with _lock:
+        current = _indexes.get(key)
+        if current is not None and current.version > index.version:
+            return
+        _indexes[key] = index
+    for callback in list(_build_hooks):
+        try:
+            callback(index)
+        except Exception as e:
+            logger.error(f"index build hook {getattr(callback, '__name__', callback)} failed: {str(e)}")
+
+
+def set_watched(file_path: str, watched: bool = True) -> None:
+    """Mark a workbook as kept fresh by a watcher, so lookups skip the stat call."""
+    key = os.path.abspath(file_path)
+    with _lock:
+        if watched:
+            _watched.add(key)
+        else:
+            _watched.discard(key)
+
+
+def get_workbook_index(file_path: str) -> WorkbookIndex:
+    """Return the current index of the workbook, building it if needed."""
+    key = os.path.abspath(file_path)
+    cached = _indexes.get(key)
+    if cached is not None and (key in _watched or cached.version == workbook_version(file_path)):
+        CACHE_HITS.inc(cache="workbook_index")
+        return cached
+
+    CACHE_MISSES.inc(cache="workbook_index")
+    index = build_workbook_index(file_path)
+    install_index(index)
+    return index
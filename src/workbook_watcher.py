@@ -0,0 +1,144 @@
+"""
+Filesystem watcher that keeps workbook indexes fresh.
+
+Site engineers edit DPR.xlsx in Excel while the server runs. The watcher
+listens for changes to the workbook's directory, ignores Excel lock and temp
+files (`~$DPR.xlsx`, `.~lock.DPR.xlsx#`, `*.tmp`), debounces bursts of events
+and rebuilds the index on a background thread. The new index is swapped in
+atomically, so requests keep using the previous one until it is ready.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from src.workbook_index import build_workbook_index, install_index, set_watched, get_workbook_index
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 1.0
+MAX_REBUILD_ATTEMPTS = 3
+
+
+def is_ignored(path: str) -> bool:
+    """Excel/LibreOffice lock files and temporary save files never trigger a rebuild."""
+    name = os.path.basename(path)
+    return name.startswith(("~", ".~lock.")) or name.lower().endswith(".tmp")
+
+
+class WorkbookWatcher(FileSystemEventHandler):
+    """
+    Watch one or more workbooks and rebuild their indexes after they change.
+
+    Usage:
+        watcher = WorkbookWatcher()
+        watcher.watch(FILE_PATH)
+        watcher.start()
+        ...
+        watcher.stop()
+    """
+
+    def __init__(self, debounce: float = DEFAULT_DEBOUNCE_SECONDS):
+        super().__init__()
+        self.debounce = debounce
+        self._observer: Optional[Observer] = None
+        self._files: Dict[str, int] = {}  # absolute workbook path -> failed rebuild attempts
+        self._directories = set()
+        self._timers: Dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+
+    def watch(self, file_path: str) -> None:
+        """Start tracking a workbook; builds its index now if there is none yet."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if path in self._files:
+                return
+            self._files[path] = 0
+        try:
+            get_workbook_index(path)
+        except Exception:
+            # Not tracked, so a later watch() can try again
+            with self._lock:
+                self._files.pop(path, None)
+            raise
+        set_watched(path)
+        directory = os.path.dirname(path)
+        if self._observer is not None and directory not in self._directories:
+            self._observer.schedule(self, directory, recursive=False)
+            self._directories.add(directory)
+        logger.info(f"watching workbook: {path}")
+
+    def start(self) -> None:
+        if self._observer is not None:
+            return
+        self._observer = Observer()
+        self._observer.daemon = True
+        for directory in {os.path.dirname(path) for path in self._files}:
+            self._observer.schedule(self, directory, recursive=False)
+            self._directories.add(directory)
+        self._observer.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            timers, self._timers = list(self._timers.values()), {}
+            files = list(self._files)
+        for timer in timers:
+            timer.cancel()
+        for path in files:
+            set_watched(path, False)
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+            self._directories.clear()
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # Excel saves to a temp file and renames it over the workbook, so check both ends.
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if not path or is_ignored(path):
+                continue
+            path = os.path.abspath(path)
+            if path in self._files:
+                self._schedule(path)
+
+    def _schedule(self, path: str) -> None:
+        with self._lock:
+            timer = self._timers.get(path)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.debounce, self._rebuild, args=(path,))
+            timer.daemon = True
+            self._timers[path] = timer
+        timer.start()
+
+    def _rebuild(self, path: str) -> None:
+        with self._lock:
+            self._timers.pop(path, None)
+        try:
+            index = build_workbook_index(path)
+        except Exception as e:
+            # Usually the file is still being written; try again after another debounce.
+            with self._lock:
+                attempts = self._files.get(path, 0) + 1
+                self._files[path] = attempts
+            if attempts < MAX_REBUILD_ATTEMPTS:
+                logger.warning(f"rebuild of {path} failed ({str(e)}), retrying")
+                self._schedule(path)
+            else:
+                logger.error(f"giving up rebuilding {path} after {attempts} attempts: {str(e)}")
+                with self._lock:
+                    self._files[path] = 0
+                # Fall back to stat-validated lookups until a rebuild succeeds again.
+                set_watched(path, False)
+            return
+
+        with self._lock:
+            self._files[path] = 0
+        install_index(index)
+        set_watched(path)
+        logger.info(f"workbook index swapped in for {path}")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Run from anywhere: make the repository root importable (src/, utils/, config/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,83 @@
+import asyncio
+import io
+
+import pytest
+
+from src import bulk_import
+from src.batch import BatchError
+from src.bulk_import import detect_format, import_records, iter_records, to_item
+from src.projects import Project
+
+
+def spool(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_csv_headers_are_normalised():
+    upload = "\ufeff Transcription ,Sheet_Name,NAME\n5 cum excavation,July.25,Ravi\n"
+    records = list(iter_records(spool(upload), "csv"))
+    assert [(line, record) for line, record, _ in records] == [
+        (2, {"transcription": "5 cum excavation", "sheet_name": "July.25", "name": "Ravi"})]
+
+
+def test_jsonl_invalid_lines_are_yielded_as_none():
+    upload = '{"text": "5 bags of cement"}\n\nnot json\n["a list"]\n{"text": "2 mtr pipe"}\n'
+    records = [(line, record) for line, record, _ in iter_records(spool(upload), "jsonl")]
+    assert records == [(1, {"text": "5 bags of cement"}), (3, None), (4, None), (5, {"text": "2 mtr pipe"})]
+
+
+@pytest.mark.parametrize("fmt, content_type, head, expected", [
+    ("CSV", None, "", "csv"),
+    (None, "text/csv", "", "csv"),
+    (None, "application/x-ndjson", "", "jsonl"),
+    (None, None, '\ufeff {"text": "x"}', "jsonl"),
+    (None, None, "text,sheet_name", "csv"),
+])
+def test_detect_format(fmt, content_type, head, expected):
+    upload = spool(head)
+    assert detect_format(fmt, content_type, upload) == expected
+    assert upload.tell() == 0
+
+
+def test_detect_format_rejects_unknown_format():
+    with pytest.raises(BatchError):
+        detect_format("xlsx", None, spool(""))
+
+
+def test_to_item_falls_back_to_upload_defaults():
+    defaults = {"sheet_name": "July.25", "name": "Site office", "location": "Block A"}
+    item = to_item(3, {"body": " 5 cum excavation ", "date": "2025-07-01", "name": "Ravi"}, "raw", defaults)
+    assert item["transcription"] == "5 cum excavation (date: 2025-07-01)"
+    assert (item["sheet_name"], item["name"], item["location"]) == ("July.25", "Ravi", "Block A")
+
+
+def test_to_item_ids():
+    assert to_item(3, {"text": "x", "request_id": 42}, "raw", {})["id"] == "42"
+    default_id = to_item(3, {"text": "x"}, "raw", {})["id"]
+    # Stable across re-uploads of the same file, distinct per line and content
+    assert default_id == to_item(3, {"text": "x"}, "raw", {})["id"]
+    assert default_id != to_item(4, {"text": "x"}, "raw", {})["id"]
+    assert default_id != to_item(3, {"text": "x"}, "other", {})["id"]
+
+
+def test_import_records_rejects_bad_lines_and_summarises(monkeypatch, tmp_path):
+    running, peak = [0], [0]
+
+    async def process_item(item, project, priority):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"id": item["id"], "status": "ok"}
+
+    monkeypatch.setattr(bulk_import, "process_item", process_item)
+    upload = "".join(f'{{"text": "{i} cum excavation"}}\n' for i in range(5)) + "not json\n"
+
+    async def main():
+        project = Project("test", str(tmp_path / "DPR.xlsx"))
+        return [result async for result in import_records(spool(upload), "jsonl", project, concurrency=2)]
+
+    results = asyncio.run(main())
+    assert {"line": 6, "id": None, "status": "rejected", "error": "Invalid record"} in results
+    assert results[-1] == {"summary": {"ok": 5, "duplicate": 0, "rejected": 1, "error": 0}}
+    assert peak[0] == 2
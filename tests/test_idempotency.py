@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from src.idempotency import DONE, PENDING, WRITTEN, DedupeStore, SubmissionInProgress, mark_written, run_once
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DedupeStore(str(tmp_path / "dedupe.sqlite3"))
+    yield store
+    store.close()
+
+
+class Work:
+    """Counts runs; optionally marks the cell written and/or fails afterwards."""
+
+    def __init__(self, write=True, fail=False):
+        self.write = write
+        self.fail = fail
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        result = {"value": self.runs}
+        if self.write:
+            await asyncio.to_thread(mark_written, result)
+        if self.fail:
+            raise RuntimeError("logging failed")
+        return result
+
+
+def test_second_submission_is_a_duplicate(store):
+    work = Work()
+    assert asyncio.run(run_once(store, "k", work)) == ({"value": 1}, False)
+    assert asyncio.run(run_once(store, "k", work)) == ({"value": 1}, True)
+    assert work.runs == 1
+    assert store.lookup("k")[0] == DONE
+
+
+def test_failure_before_the_write_releases_the_key(store):
+    work = Work(write=False, fail=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_once(store, "k", work))
+    assert store.lookup("k") == (None, None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_once(store, "k", work))
+    assert work.runs == 2
+
+
+def test_failure_after_the_write_keeps_the_key(store):
+    work = Work(fail=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_once(store, "k", work))
+    assert store.lookup("k") == (WRITTEN, {"value": 1})
+    assert asyncio.run(run_once(store, "k", work)) == ({"value": 1}, True)
+    assert work.runs == 1
+
+
+def test_cancellation_after_the_write_keeps_the_key(store):
+    from src.main import run_to_completion
+
+    def slow_write():
+        time.sleep(0.1)
+        mark_written({"value": 1})
+
+    async def work():
+        await run_to_completion(asyncio.to_thread(slow_write))
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.ensure_future(run_once(store, "k", work))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert store.lookup("k") == (WRITTEN, {"value": 1})
+
+
+def test_pending_alternate_key_is_waited_for(store):
+    work = Work()
+
+    async def main():
+        assert store.claim("previous-bucket")[0]
+        task = asyncio.ensure_future(
+            run_once(store, "k", work, alternate_keys=("previous-bucket",), poll_interval=0.01))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        store.complete("previous-bucket", {"value": "original"})
+        return await task
+
+    assert asyncio.run(main()) == ({"value": "original"}, True)
+    assert work.runs == 0
+    assert store.lookup("k") == (None, None)
+
+
+def test_released_alternate_key_lets_the_retry_run(store):
+    work = Work()
+
+    async def main():
+        assert store.claim("previous-bucket")[0]
+        task = asyncio.ensure_future(
+            run_once(store, "k", work, alternate_keys=("previous-bucket",), poll_interval=0.01))
+        await asyncio.sleep(0.05)
+        store.release("previous-bucket")
+        return await task
+
+    assert asyncio.run(main()) == ({"value": 1}, False)
+    assert store.lookup("previous-bucket")[0] is None
+    assert store.lookup("k")[0] == DONE
+
+
+def test_key_in_flight_in_this_process_times_out(store):
+    assert store.claim("k")[0]
+    with pytest.raises(SubmissionInProgress):
+        asyncio.run(run_once(store, "k", Work(), wait_timeout=0.05, poll_interval=0.01))
+    assert store.lookup("k")[0] == PENDING
+
+
+def test_restart_drops_pending_claims_of_the_previous_process(tmp_path):
+    path = str(tmp_path / "dedupe.sqlite3")
+    crashed = DedupeStore(path)
+    assert crashed.claim("k")[0]
+    # Same process ID, new store: the server was restarted after dying mid-submission.
+    restarted = DedupeStore(path)
+    assert restarted.lookup("k") == (None, None)
+    assert asyncio.run(run_once(restarted, "k", Work())) == ({"value": 1}, False)
+    crashed.close()
+    restarted.close()
+
+
+def test_dead_process_claim_is_taken_over(store):
+    store._conn.execute("INSERT INTO submissions (key, state, created_at, owner) VALUES (?, ?, ?, ?)",
+                        ("k", PENDING, time.time(), f"{store.owner.rsplit(':', 2)[0]}:999999999:dead"))
+    assert store.claim("k")[0]
+
+
+def test_claim_older_than_the_lease_is_taken_over(tmp_path):
+    store = DedupeStore(str(tmp_path / "dedupe.sqlite3"), lease=60)
+    store._conn.execute("INSERT INTO submissions (key, state, created_at, owner) VALUES (?, ?, ?, ?)",
+                        ("fresh", PENDING, time.time(), "other-host:1:live"))
+    store._conn.execute("INSERT INTO submissions (key, state, created_at, owner) VALUES (?, ?, ?, ?)",
+                        ("stale", PENDING, time.time() - 61, "other-host:1:live"))
+    assert not store.claim("fresh")[0]
+    assert store.claim("stale")[0]
+    store.close()
+
+
+def test_abandoned_alternate_key_is_not_waited_for(tmp_path):
+    path = str(tmp_path / "dedupe.sqlite3")
+    crashed = DedupeStore(path)
+    restarted = DedupeStore(path)
+    # Claimed by the earlier store of this process ID, which no longer runs anything
+    assert crashed.claim("previous-bucket")[0]
+    result = asyncio.run(run_once(restarted, "k", Work(), alternate_keys=("previous-bucket",),
+                                  wait_timeout=0.05, poll_interval=0.01))
+    assert result == ({"value": 1}, False)
+    crashed.close()
+    restarted.close()
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.llm_cascade import CASCADE_ESCALATIONS, CascadeSettings, cascade_run
+from src.llm_providers import Provider
+from src.llm_scheduler import LLMScheduler
+
+SETTINGS = CascadeSettings(min_confidence=0.8, fast_timeout=0.1)
+
+
+class Agent:
+    def __init__(self, item_id="a1", confidence=0.9, delay=0.0):
+        self.output = SimpleNamespace(item_id=item_id, confidence=confidence)
+        self.delay = delay
+        self.calls = 0
+
+    async def run(self, prompt, deps=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(output=self.output, usage=lambda: SimpleNamespace(total_tokens=10))
+
+
+def provider(name, agent, requests_per_minute=60000):
+    scheduler = LLMScheduler(name, requests_per_minute=requests_per_minute, tokens_per_minute=10 ** 9)
+    return Provider(name, lambda _: agent, scheduler=scheduler)
+
+
+def run(fast, large):
+    return asyncio.run(cascade_run(fast, large, "p", lambda item_id: item_id == "a1", settings=SETTINGS))
+
+
+def escalations(reason):
+    return CASCADE_ESCALATIONS.value(reason=reason)
+
+
+def test_confident_fast_answer_is_used():
+    fast, large = provider("small", Agent()), provider("big", Agent())
+    _, used, attempts = run([fast], [large])
+    assert used is fast and attempts == []
+    assert large.agent.calls == 0
+
+
+def test_low_confidence_and_invalid_items_escalate():
+    for agent, reason in ((Agent(confidence=0.3), "low_confidence"), (Agent(item_id="zz"), "invalid_item")):
+        before = escalations(reason)
+        fast, large = provider("small", agent), provider("big", Agent())
+        _, used, attempts = run([fast], [large])
+        assert used is large and attempts[0][1] is fast
+        assert escalations(reason) == before + 1
+
+
+def test_slow_fast_call_times_out():
+    before = escalations("timeout")
+    fast, large = provider("small", Agent(delay=1.0)), provider("big", Agent())
+    _, used, _ = run([fast], [large])
+    assert used is large
+    assert escalations("timeout") == before + 1
+
+
+def test_queueing_for_the_fast_slot_does_not_count_against_the_timeout():
+    # 0.15s call after a short wait for a concurrency slot, with a 0.2s call timeout
+    settings = CascadeSettings(min_confidence=0.8, fast_timeout=0.2)
+    fast, large = provider("small", Agent(delay=0.15)), provider("big", Agent())
+    fast.scheduler.limiter.limit = 1
+
+    async def main():
+        first = asyncio.ensure_future(cascade_run([fast], [large], "p", lambda i: True, settings=settings))
+        second = asyncio.ensure_future(cascade_run([fast], [large], "p", lambda i: True, settings=settings))
+        return await asyncio.gather(first, second)
+
+    results = asyncio.run(main())
+    assert [used for _, used, _ in results] == [fast, fast]
+    assert large.agent.calls == 0
+
+
+def test_fast_tier_out_of_budget_is_skipped():
+    before = escalations("saturated")
+    fast, large = provider("small", Agent(), requests_per_minute=1), provider("big", Agent())
+    fast.scheduler.requests.consume(1)
+    _, used, _ = run([fast], [large])
+    assert used is large and fast.agent.calls == 0
+    assert escalations("saturated") == before + 1
+
+
+def test_escalation_skips_fast_models_in_the_large_chain():
+    fast = provider("small", Agent(confidence=0.1))
+    big, small_again = provider("big", Agent(delay=1.0)), provider("small", Agent())
+    big.stats.initial_delay = 0.01
+    _, used, _ = run([fast], [big, small_again])
+    assert used is big
+    assert small_again.agent.calls == 0
@@ -0,0 +1,193 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm_providers import CircuitBreaker, Provider, ProviderStats, hedged_run
+from src.llm_scheduler import LLMScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAgent:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def run(self, prompt, deps=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(output=prompt, usage=lambda: SimpleNamespace(total_tokens=10))
+
+
+def make_provider(name, agent, breaker=None, hedge_delay=0.05):
+    scheduler = LLMScheduler(name, requests_per_minute=60000, tokens_per_minute=10 ** 9)
+    stats = ProviderStats(initial_delay=hedge_delay)
+    return Provider(name, lambda _: agent, stats=stats, breaker=breaker, scheduler=scheduler)
+
+
+def half_open_breaker():
+    """A breaker that is open and past its cooldown: the next allow() is the trial call."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 11
+    return breaker
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10, clock=FakeClock())
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failures():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_breaker_half_open_allows_a_single_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_restarts_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    clock.now = 15
+    assert not breaker.allow()
+    clock.now = 20
+    assert breaker.allow()
+
+
+def test_breaker_released_trial_can_be_retried():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+
+
+def test_hedged_run_primary_wins_without_hedging():
+    primary, secondary = FakeAgent(), FakeAgent()
+    providers = [make_provider("a", primary), make_provider("b", secondary)]
+    response, provider = asyncio.run(hedged_run(providers, "p"))
+    assert provider is providers[0]
+    assert response.output == "p"
+    assert secondary.calls == 0
+
+
+def test_hedged_run_hedges_and_cancels_the_loser():
+    primary, secondary = FakeAgent(delay=1.0), FakeAgent()
+    providers = [make_provider("a", primary), make_provider("b", secondary)]
+    _, provider = asyncio.run(hedged_run(providers, "p"))
+    assert provider is providers[1]
+    assert primary.cancelled == 1
+    # A lost hedge is not a failure
+    assert providers[0].breaker.failures == 0
+    assert providers[0].breaker.allow()
+
+
+def test_hedged_run_fails_over_on_error():
+    providers = [make_provider("a", FakeAgent(error=RuntimeError("down"))), make_provider("b", FakeAgent())]
+    _, provider = asyncio.run(hedged_run(providers, "p"))
+    assert provider is providers[1]
+    assert providers[0].breaker.failures == 1
+
+
+def test_failover_keeps_the_callers_timeout():
+    # The secondary outlasts the primary's hedge delay; with no timeout it must still finish.
+    providers = [make_provider("a", FakeAgent(error=RuntimeError("down"))),
+                 make_provider("b", FakeAgent(delay=0.2))]
+    _, provider = asyncio.run(hedged_run(providers, "p", timeout=None))
+    assert provider is providers[1]
+    assert providers[1].breaker.failures == 0
+
+
+def test_hedge_keeps_the_callers_timeout():
+    primary, secondary = FakeAgent(delay=1.0), FakeAgent(delay=0.2)
+    providers = [make_provider("a", primary), make_provider("b", secondary), make_provider("c", FakeAgent(delay=1.0))]
+    _, provider = asyncio.run(hedged_run(providers, "p", timeout=0.5))
+    assert provider is providers[1]
+    assert providers[1].breaker.failures == 0
+
+
+def test_hedged_run_raises_when_every_provider_fails():
+    providers = [make_provider("a", FakeAgent(error=RuntimeError("a"))),
+                 make_provider("b", FakeAgent(error=RuntimeError("b")))]
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedged_run(providers, "p"))
+
+
+def test_unlaunched_half_open_provider_keeps_its_trial():
+    providers = [make_provider("a", FakeAgent()), make_provider("b", FakeAgent(), breaker=half_open_breaker())]
+    for _ in range(3):
+        _, provider = asyncio.run(hedged_run(providers, "p"))
+        assert provider is providers[0]
+    assert providers[1].breaker.allow()
+
+
+def test_cancelled_trial_hedge_is_released():
+    secondary = FakeAgent(delay=1.0)
+    providers = [make_provider("a", FakeAgent(delay=0.1)),
+                 make_provider("b", secondary, breaker=half_open_breaker(), hedge_delay=0.05)]
+    _, provider = asyncio.run(hedged_run(providers, "p"))
+    assert provider is providers[0]
+    assert secondary.calls == 1 and secondary.cancelled == 1
+    assert providers[1].breaker.allow()
+
+
+def test_cancelling_hedged_run_releases_the_trial():
+    agent = FakeAgent(delay=1.0)
+    providers = [make_provider("a", agent, breaker=half_open_breaker())]
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hedged_run(providers, "p"), 0.05)
+
+    asyncio.run(main())
+    assert agent.cancelled == 1
+    assert providers[0].breaker.allow()
+
+
+def test_all_circuits_open_still_tries_the_primary():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    providers = [make_provider("a", FakeAgent(), breaker=breaker)]
+    _, provider = asyncio.run(hedged_run(providers, "p"))
+    assert provider is providers[0]
+    assert not breaker.is_open
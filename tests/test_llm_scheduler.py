@@ -0,0 +1,182 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm_scheduler import BULK, INTERACTIVE, AIMDLimiter, LLMScheduler, TokenBucket, retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, message="rate limited", body=None):
+        super().__init__(message)
+        self.body = body
+
+
+def test_token_bucket_refills_continuously_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=10, clock=clock)
+    bucket.consume(10)
+    assert bucket.delay_for(4) == 2.0
+    clock.now = 1
+    assert bucket.delay_for(4) == 1.0
+    clock.now = 100
+    assert bucket.delay_for(10) == 0.0
+    assert bucket.level == 10
+
+
+def test_token_bucket_caps_oversized_requests_at_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=10, clock=clock)
+    # Would never fit otherwise
+    assert bucket.delay_for(50) == 0.0
+    bucket.consume(50)
+    assert bucket.level == 0
+
+
+def test_token_bucket_refund_settles_the_estimate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=100, clock=clock)
+    bucket.consume(60)
+    bucket.refund(60 - 20)  # estimated 60, used 20
+    assert bucket.level == 80
+    bucket.refund(20 - 50)  # estimated 20, used 50
+    assert bucket.level == 50
+    bucket.refund(500)
+    assert bucket.level == 100
+
+
+def test_aimd_grows_by_one_per_window_and_halves_on_overload():
+    limiter = AIMDLimiter(initial=2, maximum=4)
+    # A window is `limit` calls, so each healthy call adds 1 / limit
+    limiter.on_success(1.0)
+    assert limiter.limit == pytest.approx(2.5)
+    for _ in range(20):
+        limiter.on_success(1.0)
+    assert limiter.limit == 4
+    limiter.on_overload()
+    assert limiter.limit == 2
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 1
+
+
+def test_aimd_trims_the_limit_when_latency_climbs():
+    limiter = AIMDLimiter(initial=4, maximum=8)
+    limiter.on_success(1.0)
+    before = limiter.limit
+    limiter.on_success(5.0)
+    assert limiter.limit == pytest.approx(before * 0.9)
+    # A slow call barely moves the baseline
+    assert limiter.baseline < 1.5
+
+
+def test_retry_after_header_of_the_underlying_error():
+    cause = Exception("429 Too Many Requests")
+    cause.response = SimpleNamespace(headers={"retry-after": "7"})
+    error = RateLimited()
+    error.__cause__ = cause
+    assert retry_after(error) == 7.0
+
+
+@pytest.mark.parametrize("message, seconds", [
+    ("Rate limit reached. Please try again in 1.5s.", 1.5),
+    ("Please try again in 1m2.5s. Visit https://console.groq.com", 62.5),
+    ("Please try again in 450ms.", 0.45),
+])
+def test_retry_after_groq_message(message, seconds):
+    assert retry_after(RateLimited(body={"error": {"message": message}})) == pytest.approx(seconds)
+    assert retry_after(RateLimited(message)) == pytest.approx(seconds)
+
+
+def test_retry_after_unknown():
+    assert retry_after(RateLimited("slow down")) is None
+
+
+def test_interactive_calls_are_dispatched_before_bulk():
+    async def main():
+        scheduler = LLMScheduler("test", requests_per_minute=60000, tokens_per_minute=10 ** 9,
+                                 max_concurrency=1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(name):
+            order.append(name)
+            if name == "first":
+                await release.wait()
+
+        first = asyncio.ensure_future(scheduler.run(lambda: call("first"), tokens=1))
+        await asyncio.sleep(0)
+        tasks = [asyncio.ensure_future(scheduler.run(lambda i=i: call(f"bulk-{i}"), tokens=1, priority=BULK))
+                 for i in range(2)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(
+            scheduler.run(lambda: call("interactive"), tokens=1, priority=INTERACTIVE)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *tasks)
+        return order
+
+    assert asyncio.run(main()) == ["first", "interactive", "bulk-0", "bulk-1"]
+
+
+def test_rate_limited_call_pauses_the_scheduler_and_retries():
+    async def main():
+        scheduler = LLMScheduler("test", requests_per_minute=60000, tokens_per_minute=10 ** 9,
+                                 base_backoff=0.01)
+        attempts, limits = [], []
+
+        async def call():
+            attempts.append(scheduler.clock())
+            limits.append(scheduler.limiter.limit)
+            if len(attempts) == 1:
+                raise RateLimited("Please try again in 0.05s.")
+            return "ok"
+
+        result = await scheduler.run(call, tokens=1)
+        return result, attempts, limits, scheduler
+
+    result, attempts, limits, scheduler = asyncio.run(main())
+    assert result == "ok"
+    assert attempts[1] - attempts[0] >= 0.05
+    assert scheduler.blocked_until >= attempts[0] + 0.05
+    assert limits == [2, 1]
+    assert scheduler.in_flight == 0
+
+
+def test_rate_limited_call_gives_up_after_max_retries():
+    async def main():
+        scheduler = LLMScheduler("test", requests_per_minute=60000, tokens_per_minute=10 ** 9,
+                                 max_retries=2, base_backoff=0.001)
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise RateLimited()
+
+        with pytest.raises(RateLimited):
+            await scheduler.run(call, tokens=1)
+        return len(calls), scheduler.in_flight
+
+    assert asyncio.run(main()) == (3, 0)
+
+
+def test_saturated_when_paused_or_out_of_request_budget():
+    clock = FakeClock()
+    scheduler = LLMScheduler("test", requests_per_minute=60, tokens_per_minute=10 ** 9, clock=clock)
+    assert not scheduler.saturated
+    scheduler.blocked_until = 5
+    assert scheduler.saturated
+    clock.now = 6
+    assert not scheduler.saturated
+    scheduler.requests.consume(60)
+    assert scheduler.saturated
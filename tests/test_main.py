@@ -0,0 +1,35 @@
+import asyncio
+import datetime
+import time
+
+from src import main
+from src.projects import Project
+
+
+def test_cancelled_report_keeps_the_write_lock_until_the_log_is_saved(tmp_path, monkeypatch):
+    events = []
+
+    async def llm_result(description, file_path, sheet_name, priority):
+        return 5, 10.0, datetime.date(2025, 7, 1), "1269893a"
+
+    def put_logs_in_file(**kwargs):
+        time.sleep(0.1)
+        events.append("log saved")
+
+    monkeypatch.setattr(main, "get_llm_result", llm_result)
+    monkeypatch.setattr(main, "get_date_column", lambda *args: 11)
+    monkeypatch.setattr(main, "update_sheet", lambda **kwargs: events.append("cell saved"))
+    monkeypatch.setattr(main, "put_logs_in_file", put_logs_in_file)
+    project = Project("test", str(tmp_path / "DPR.xlsx"))
+
+    async def run():
+        task = asyncio.ensure_future(main.updated_quantity_in_sheet("5 cum", "July.25", project=project))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        # The next report waits for the lock; it must not get it before the log write is done
+        async with project.write_lock:
+            events.append("next report")
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert events == ["cell saved", "log saved", "next report"]
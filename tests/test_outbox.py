@@ -0,0 +1,51 @@
+import io
+import json
+import urllib.error
+
+import pytest
+
+from desktop_app.outbox import FAILED, PENDING, Outbox
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), base_backoff=60)
+    yield outbox
+    outbox.close()
+
+
+def http_error(code, detail):
+    body = io.BytesIO(json.dumps({"detail": detail}).encode("utf-8"))
+    return urllib.error.HTTPError("http://dpr/process_batch", code, "error", {}, body)
+
+
+def failing_sender(error):
+    def send(items):
+        raise error
+    return send
+
+
+def test_client_error_rejects_the_batch(outbox):
+    outbox.add("10 cum excavation", "July.25")
+    outbox.add("5 cum concrete", "July.25")
+    result = outbox.sync(failing_sender(http_error(404, "Unknown project site-b")))
+    assert result["error"] is None
+    assert result["failed"] == 2
+    assert outbox.counts() == {PENDING: 0, FAILED: 2}
+
+
+def test_server_error_is_retried_later(outbox):
+    outbox.add("10 cum excavation", "July.25")
+    result = outbox.sync(failing_sender(http_error(503, "Service unavailable")))
+    assert result["error"] is None
+    assert result["failed"] == 1
+    assert outbox.counts() == {PENDING: 1, FAILED: 0}
+    assert outbox.due() == []
+
+
+def test_unreachable_server_keeps_reports_queued(outbox):
+    outbox.add("10 cum excavation", "July.25")
+    result = outbox.sync(failing_sender(urllib.error.URLError("connection refused")))
+    assert "connection refused" in result["error"]
+    assert result["failed"] == 0
+    assert len(outbox.due()) == 1
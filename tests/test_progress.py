@@ -0,0 +1,46 @@
+import datetime
+
+import openpyxl
+import pytest
+
+from src.progress import daily_summary, item_summary
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "DPR.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "July.25"
+    ws.cell(row=1, column=10, value=datetime.datetime(2025, 7, 1))
+    ws.cell(row=1, column=12, value=datetime.datetime(2025, 7, 2))
+    for row, (description, boq, day1, day2) in enumerate([("Excavation", 100, 5, 7), ("Concrete", 50, 0, 2)], start=5):
+        ws.cell(row=row, column=3, value=description)
+        ws.cell(row=row, column=6, value=boq)
+        ws.cell(row=row, column=11, value=day1)
+        ws.cell(row=row, column=13, value=day2)
+    logs = wb.create_sheet("LOGS")
+    for row in range(1, 10):
+        logs.cell(row=row, column=3, value=f"log line {row}")
+    wb.save(path)
+    return path
+
+
+def test_item_summary_totals(workbook):
+    summary = item_summary(workbook, "July.25", today=datetime.date(2025, 7, 2))
+    assert summary["total_achieved"] == 14
+    assert [item["achieved"] for item in summary["items"]] == [12, 2]
+    assert summary["items"][0]["percent_complete"] == 12
+
+
+def test_daily_summary_totals(workbook):
+    summary = daily_summary(workbook, "July.25")
+    assert [day["total"] for day in summary["days"]] == [5, 9]
+
+
+@pytest.mark.parametrize("sheet", ["LOGS", "Missing"])
+def test_sheets_without_progress_raise_key_error(workbook, sheet):
+    with pytest.raises(KeyError):
+        item_summary(workbook, sheet)
+    with pytest.raises(KeyError):
+        daily_summary(workbook, sheet)
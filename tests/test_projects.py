@@ -0,0 +1,61 @@
+import asyncio
+
+from config.configuration import FILE_PATH
+from src.llm_scheduler import BULK, INTERACTIVE
+from src.projects import PriorityLimiter, Project, ProjectRegistry, load_projects
+
+
+def test_interactive_waiter_gets_the_next_slot():
+    async def main():
+        limiter = PriorityLimiter(1)
+        order = []
+
+        async def work(name, priority):
+            async with limiter.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await limiter.acquire(BULK)
+        tasks = [asyncio.ensure_future(work(f"bulk-{i}", BULK)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(work("interactive", INTERACTIVE)))
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter.in_use
+
+    order, in_use = asyncio.run(main())
+    assert order == ["interactive", "bulk-0", "bulk-1", "bulk-2"]
+    assert in_use == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def main():
+        limiter = PriorityLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire(BULK))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 1)
+        return limiter.in_use
+
+    assert asyncio.run(main()) == 1
+
+
+def test_projects_on_one_workbook_share_the_write_lock(tmp_path):
+    path = str(tmp_path / "DPR.xlsx")
+    registry = ProjectRegistry([Project("default", path), Project("site-a", path),
+                                Project("site-b", str(tmp_path / "Other.xlsx"))])
+    assert registry.get("site-a").write_lock is registry.get("default").write_lock
+    assert registry.for_path(path).write_lock is registry.get("default").write_lock
+    assert registry.get("site-b").write_lock is not registry.get("default").write_lock
+
+
+def test_relative_excel_file_path_is_inside_excel_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EXCEL_FILE_PATH", "DPR.xlsx")
+    assert load_projects(str(tmp_path / "missing.json")).get().file_path == FILE_PATH
+    monkeypatch.setenv("EXCEL_FILE_PATH", str(tmp_path / "site.xlsx"))
+    assert load_projects(str(tmp_path / "missing.json")).get().file_path == str(tmp_path / "site.xlsx")
@@ -0,0 +1,22 @@
+from src import prompt
+from src.item_catalog import ItemCatalog
+
+
+def catalog(path, key, items):
+    return ItemCatalog(file_path=path, version=(0, 0), items=items, sheets={}, key=key)
+
+
+def test_prefix_of_replaced_catalog_is_dropped(tmp_path):
+    path = str(tmp_path / "DPR.xlsx")
+    old = prompt.get_prompt_prefix(catalog(path, "test-old", {"a1": "excavation"}))
+    new = prompt.get_prompt_prefix(catalog(path, "test-new", {"a1": "excavation", "b2": "concrete"}))
+    assert old.catalog_key not in prompt._prefixes
+    assert prompt._prefixes[new.catalog_key] is new
+
+
+def test_prefix_shared_by_another_workbook_is_kept(tmp_path):
+    items = {"a1": "excavation"}
+    shared = prompt.get_prompt_prefix(catalog(str(tmp_path / "A.xlsx"), "test-shared", items))
+    prompt.get_prompt_prefix(catalog(str(tmp_path / "B.xlsx"), "test-shared", items))
+    prompt.get_prompt_prefix(catalog(str(tmp_path / "A.xlsx"), "test-changed", {"b2": "concrete"}))
+    assert prompt._prefixes["test-shared"] is shared
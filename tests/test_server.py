@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from src import idempotency
+from src.idempotency import DedupeStore, SubmissionInProgress
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = DedupeStore(str(tmp_path / "dedupe.sqlite3"))
+    monkeypatch.setattr(idempotency, "_store", store)
+    yield TestClient(server.app)
+    store.close()
+
+
+def process(client, key="report-1"):
+    return client.post("/process", headers={"Idempotency-Key": key},
+                       json={"transcription_list": ["5 bags of cement"], "sheet_name": "July.25"})
+
+
+def test_retry_of_a_running_submission_is_a_conflict(client, monkeypatch):
+    async def still_running(*args, **kwargs):
+        raise SubmissionInProgress("submission report-1 is still being processed")
+
+    monkeypatch.setattr(server, "run_once", still_running)
+    assert process(client).status_code == 409
+
+
+def test_timeout_inside_the_pipeline_is_not_a_conflict(client, monkeypatch):
+    async def llm_timed_out(*args, **kwargs):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(server, "updated_quantity_in_sheet", llm_timed_out)
+    assert process(client).status_code == 500
+    # The failed attempt released its key, so the retry runs for real
+    assert idempotency._store.lookup("client:default:report-1:0") == (None, None)
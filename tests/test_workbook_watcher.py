@@ -0,0 +1,80 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import workbook_watcher
+from src.workbook_index import _watched
+from src.workbook_watcher import MAX_REBUILD_ATTEMPTS, WorkbookWatcher, is_ignored
+
+
+@pytest.mark.parametrize("path, ignored", [
+    ("/data/~$DPR.xlsx", True),
+    ("/data/.~lock.DPR.xlsx#", True),
+    ("/data/DPR.xlsx.1234.TMP", True),
+    ("/data/DPR.xlsx", False),
+    ("/data/July~report.xlsx", False),
+])
+def test_is_ignored(path, ignored):
+    assert is_ignored(path) is ignored
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    """A watcher tracking tmp_path/DPR.xlsx, with index builds recorded instead of run."""
+    path = str(tmp_path / "DPR.xlsx")
+    builds, installed = [], []
+
+    def build(file_path):
+        builds.append(file_path)
+        if watcher.fail:
+            raise OSError("file is being written")
+        return SimpleNamespace(file_path=file_path)
+
+    monkeypatch.setattr(workbook_watcher, "build_workbook_index", build)
+    monkeypatch.setattr(workbook_watcher, "install_index", installed.append)
+    monkeypatch.setattr(workbook_watcher, "get_workbook_index", lambda file_path: None)
+    watcher = WorkbookWatcher(debounce=0.02)
+    watcher.fail = False
+    watcher.path, watcher.builds, watcher.installed = path, builds, installed
+    watcher.watch(path)
+    yield watcher
+    watcher.stop()
+
+
+def event(src_path, dest_path="", is_directory=False):
+    return SimpleNamespace(src_path=src_path, dest_path=dest_path, is_directory=is_directory)
+
+
+def test_burst_of_events_rebuilds_once(watcher):
+    for _ in range(5):
+        watcher.on_any_event(event(watcher.path))
+        time.sleep(0.005)
+    time.sleep(0.1)
+    assert watcher.builds == [watcher.path]
+    assert len(watcher.installed) == 1
+    assert watcher.path in _watched
+
+
+def test_lock_files_and_other_files_are_ignored(watcher, tmp_path):
+    watcher.on_any_event(event(str(tmp_path / "~$DPR.xlsx")))
+    watcher.on_any_event(event(str(tmp_path / "Other.xlsx")))
+    watcher.on_any_event(event(str(tmp_path), is_directory=True))
+    time.sleep(0.1)
+    assert watcher.builds == []
+
+
+def test_rename_over_the_workbook_triggers_a_rebuild(watcher, tmp_path):
+    # Excel writes a temp file and renames it over the workbook
+    watcher.on_any_event(event(str(tmp_path / "A1B2C3.tmp"), dest_path=watcher.path))
+    time.sleep(0.1)
+    assert watcher.builds == [watcher.path]
+
+
+def test_failed_rebuild_retries_then_falls_back_to_stat_checks(watcher):
+    watcher.fail = True
+    watcher.on_any_event(event(watcher.path))
+    time.sleep(0.05 * (MAX_REBUILD_ATTEMPTS + 2))
+    assert len(watcher.builds) == MAX_REBUILD_ATTEMPTS
+    assert watcher.installed == []
+    assert watcher.path not in _watched
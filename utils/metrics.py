@@ -0,0 +1,218 @@
+# metrics.py
+"""
+In-process metrics for the DPR pipeline.
+
+Counters, gauges and histograms are kept in a single registry and rendered in the
+Prometheus text exposition format (served by `/metrics` in server.py).
+Timing spans can optionally be mirrored as JSON lines by setting the
+`DPR_METRICS_JSONL` environment variable to a file path.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_jsonl_lock = threading.Lock()
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. a current limit or queue length."""
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> str:
+        return super().render().replace(f"# TYPE {self.name} counter", f"# TYPE {self.name} gauge", 1)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{plain} {state[-1]}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Holds every metric so they can be rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "dpr_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_FAILURES = REGISTRY.counter(
+    "dpr_stage_failures_total", "Pipeline stages that raised an exception.", ("stage",))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "dpr_http_request_duration_seconds", "HTTP request latency per endpoint.", ("method", "endpoint", "status"))
+LLM_INPUT_TOKENS = REGISTRY.counter(
+    "dpr_llm_input_tokens_total", "Prompt tokens sent to the LLM.", ("model",))
+LLM_OUTPUT_TOKENS = REGISTRY.counter(
+    "dpr_llm_output_tokens_total", "Completion tokens received from the LLM.", ("model",))
+LLM_RETRIES = REGISTRY.counter(
+    "dpr_llm_retries_total", "Extra LLM requests made to get a valid result.", ("model",))
+CACHE_HITS = REGISTRY.counter(
+    "dpr_cache_hits_total", "Cache lookups that were served from the cache.", ("cache",))
+CACHE_MISSES = REGISTRY.counter(
+    "dpr_cache_misses_total", "Cache lookups that had to be recomputed.", ("cache",))
+
+
+def emit_event(event: dict, path: Optional[str] = None) -> None:
+    """
+    Append a structured event as one JSON line to `DPR_METRICS_JSONL`.
+    Does nothing when the variable is not set.
+    """
+    path = path or os.getenv("DPR_METRICS_JSONL")
+    if not path:
+        return
+    line = json.dumps(event, default=str)
+    with _jsonl_lock:
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """
+    Time the wrapped block and record it under `stage`.
+
+    Usage:
+        with span("update_sheet", sheet=sheet_name):
+            update_sheet(...)
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        STAGE_FAILURES.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        emit_event({"ts": time.time(), "stage": stage, "seconds": round(elapsed, 6),
+                    "status": status, **fields})
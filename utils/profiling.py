@@ -0,0 +1,176 @@
+# profiling.py
+"""
+Opt-in profiling of single requests.
+
+Controlled by the `DPR_PROFILE` environment variable:
+    - unset / "0": off; the only cost is one environment lookup per request
+    - "header":    profile requests that carry an `X-DPR-Profile: 1` header
+    - "all":       profile every request (and every desktop save)
+
+A profiled request runs under cProfile (the event loop thread) and a
+sampling thread that also sees the worker threads doing workbook I/O. Both
+are written to logs/ under the request ID:
+    - profile-<request id>.pstats     open with `python -m pstats` or snakeviz
+    - profile-<request id>.collapsed  collapsed stacks for speedscope / flamegraph.pl
+
+Only one request is profiled at a time; cProfile cannot nest, and
+overlapping profiles would mix each other's samples.
+
+Both profilers see threads, not requests: everything the event loop and the
+worker threads run while the profiled request is in flight ends up in its
+profile, including the coroutines of other requests served concurrently
+(and background warm-ups). For a profile of one request alone, send it to an
+otherwise idle server.
+"""
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from utils.logger import LOG_DIR, get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_HEADER = "x-dpr-profile"
+DEFAULT_INTERVAL = 0.005
+
+_active = threading.Lock()
+_current: ContextVar[Optional[str]] = ContextVar("dpr_profile", default=None)
+
+
+def profiling_mode() -> str:
+    return os.getenv("DPR_PROFILE", "0").strip().lower()
+
+
+def wants_profile(headers=None) -> bool:
+    """Whether the current request (or call, without headers) should be profiled."""
+    mode = profiling_mode()
+    if mode in ("", "0", "off", "false"):
+        return False
+    if mode in ("1", "all", "true"):
+        return True
+    return mode == "header" and headers is not None and headers.get(PROFILE_HEADER, "") not in ("", "0")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _is_idle(frame) -> bool:
+    """Worker threads parked on their queue carry no information."""
+    code = frame.f_code
+    return (code.co_name, os.path.basename(code.co_filename)) in (
+        ("wait", "threading.py"), ("get", "queue.py"), ("_worker", "thread.py"))
+
+
+class StackSampler:
+    """Background thread that counts the Python stacks of the profiled threads."""
+
+    def __init__(self, main_thread_id: int, interval: float = DEFAULT_INTERVAL):
+        self.main_thread_id = main_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dpr-profile-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == own:
+                    continue
+                # The event loop thread plus asyncio.to_thread workers (workbook reads/writes)
+                if thread_id != self.main_thread_id and not name.startswith("asyncio_"):
+                    continue
+                if thread_id != self.main_thread_id and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join([name, *reversed(stack)])] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile(request_id: str, label: str, interval: Optional[float] = None):
+    """
+    Profile the wrapped block and write the results to logs/ under `request_id`.
+
+    Yields the request ID when profiling, or None when another profile is
+    already running (the block then runs unprofiled).
+
+    Usage:
+        with profile(request_id, "/process"):
+            await handler()
+    """
+    if _current.get() is not None or not _active.acquire(blocking=False):
+        yield None
+        return
+    token = _current.set(request_id)
+    interval = interval or float(os.getenv("DPR_PROFILE_INTERVAL", DEFAULT_INTERVAL))
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval)
+    start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield request_id
+    finally:
+        profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        try:
+            stem = LOG_DIR / f"profile-{request_id}"
+            profiler.dump_stats(f"{stem}.pstats")
+            sampler.write_collapsed(f"{stem}.collapsed")
+            logger.info(f"profiled {label} ({request_id}) in {elapsed:.3f}s, "
+                        f"{sampler.samples} samples: {stem}.pstats, {stem}.collapsed")
+        except Exception as e:
+            logger.error(f"could not write profile {request_id}: {str(e)}")
+        finally:
+            _active.release()
+
+
+def profiled(label: str):
+    """
+    Decorator for coroutine functions that profiles each call when
+    DPR_PROFILE=all, unless the call is already part of a profiled request.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is not None or not wants_profile():
+                return await fn(*args, **kwargs)
+            with profile(new_request_id(), label):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate